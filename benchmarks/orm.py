@@ -0,0 +1,310 @@
+
+"""
+benchmarks of the orm hot paths against a local postgres
+
+generates the Assessment, Skill, Credit and Validation models in a temporary project,
+seeds them and measures rows per second for each benchmark, results are written as json
+for comparison across commits
+
+python benchmarks/orm.py --dbname kam_benchmark --output results.json
+python benchmarks/orm.py --baseline results.json
+"""
+
+from kam.app.controllers.model_controller import create
+from kam.app.controllers.database_controller import (
+    create_database,
+    drop_database,
+    migrate)
+
+from datetime import datetime
+
+import os
+import sys
+import json
+import time
+import yaml
+import shutil
+import platform
+import tempfile
+import importlib
+import statistics
+import subprocess
+
+import click
+
+
+# models of the readme along with their relations
+MODELS = [
+    ("Assessment", ["name:string", "year:integer"], ["has_many(\"skills\")"]),
+    ("Skill", ["name:string", "assessment:references"], ["belongs_to(\"assessment\")", "has_many(\"credits\")"]),
+    ("Credit", ["name:string", "desc:string", "skill:references"], ["belongs_to(\"skill\")", "has_many(\"validations\")"]),
+    ("Validation", ["desc:string", "text:text", "credit:references"], ["belongs_to(\"credit\")"])]
+
+# children per parent row
+FANOUT = 4
+
+
+def __git_commit():
+    """
+    return the commit of the benchmarked kam source, if any
+    """
+
+    kam_directory = os.path.dirname(os.path.abspath(importlib.import_module("kam").__file__))
+
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=kam_directory,
+            stderr=subprocess.DEVNULL,
+            text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def __create_project(connection):
+    """
+    create a temporary kam project (models are resolved from the git top level directory)
+    """
+
+    project_path = tempfile.mkdtemp(prefix="kam_benchmark_")
+
+    subprocess.check_call(["git", "init", "-q", project_path])
+
+    # write conf
+    os.makedirs(os.path.join(project_path, "config"))
+
+    db_conf = dict(
+        database=dict(
+            type="sql",
+            params=dict(
+                connection=connection,
+                pool=dict(min_size=1, max_size=1))))
+
+    with open(os.path.join(project_path, "config", "database.yml"), "w") as file:
+        yaml.safe_dump(db_conf, file)
+
+    os.chdir(project_path)
+    sys.path.insert(0, project_path)
+
+    return project_path
+
+
+def __generate_models(slots):
+    """
+    generate models and migrate a fresh database
+    """
+
+    for index, (model_klass_name, instance_variables, relations) in enumerate(MODELS):
+
+        # migrations are ordered by their timestamp (second)
+        if index > 0:
+            time.sleep(1)
+
+        create(model_klass_name, instance_variables, slots=slots)
+
+        # declare relations
+        model_path = os.path.join("app", "models", f"{model_klass_name.lower()}.py")
+
+        with open(model_path, "r") as file:
+            model_code = file.read()
+
+        declarations = "".join([f"        cls.{relation}\n" for relation in relations])
+        model_code = model_code.replace("        pass\n", declarations, 1)
+
+        with open(model_path, "w") as file:
+            file.write(model_code)
+
+    drop_database()
+    create_database()
+    migrate()
+
+    return [importlib.import_module(f"app.models.{m.lower()}") for m, _, _ in MODELS]
+
+
+def __seed(models, rows):
+    """
+    insert rows validations along with their credits, skills and assessments
+    """
+
+    Assessment, Skill, Credit, Validation = models
+
+    def insert_children(klass, reference, parent_ids, attributes):
+
+        children = [dict(attributes, **{f"{reference}_id": parent_id}) for parent_id in parent_ids for _ in range(FANOUT)]
+
+        return klass.insert_all(children)
+
+    assessment_count = max(1, rows // FANOUT ** 3)
+
+    assessment_ids = Assessment.insert_all([dict(name="assessment", year=2022)] * assessment_count)
+    skill_ids = insert_children(Skill, "assessment", assessment_ids, dict(name="skill"))
+    credit_ids = insert_children(Credit, "skill", skill_ids, dict(name="credit", desc="credit"))
+    validation_ids = insert_children(Validation, "credit", credit_ids, dict(desc="validation", text="text"))
+
+    return len(validation_ids)
+
+
+def measure(function, rows, repeat):
+    """
+    run function repeat times and return its best and median durations along with its throughput
+    """
+
+    durations = []
+
+    for _ in range(repeat):
+
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    best = min(durations)
+
+    return dict(
+        rows=rows,
+        best=best,
+        median=statistics.median(durations),
+        rows_per_second=rows / best)
+
+
+def run_benchmarks(models, rows, repeat):
+    """
+    measure the orm hot paths
+    """
+
+    Assessment, Skill, Credit, Validation = models
+
+    validation_count = __seed(models, rows)
+    write_count = max(1, rows // 10)
+
+    def traverse(assessments):
+
+        return [validation
+                for assessment in assessments
+                for skill in assessment.skills()
+                for credit in skill.credits()
+                for validation in credit.validations()]
+
+    benchmarks = dict(
+
+        # models
+        instantiate=(lambda: [Validation(desc="validation", text="text", credit_id=1) for _ in range(rows)], rows),
+
+        # reads
+        all=(lambda: list(Validation.all()), validation_count),
+        where_through_0=(lambda: list(Validation.where(desc="validation")), validation_count),
+        where_through_1=(lambda: list(Credit.where(name="credit", through=["validations"])), validation_count),
+        where_through_2=(lambda: list(Skill.where(name="skill", through=["credits", "validations"])), validation_count),
+        where_through_3=(lambda: list(Assessment.where(year=2022, through=["skills", "credits", "validations"])),
+                         validation_count),
+        traversal=(lambda: traverse(Assessment.all()), validation_count),
+        traversal_includes=(lambda: traverse(Assessment.includes("skills.credits.validations")), validation_count),
+
+        # writes (last, reads are not affected by the written rows)
+        save=(lambda: [Assessment(name="save", year=2023).save() for _ in range(write_count)], write_count),
+        insert=(lambda: Assessment.insert_all([dict(name="insert", year=2023)] * rows), rows))
+
+    results = {}
+
+    for name, (function, benchmark_rows) in benchmarks.items():
+
+        results[name] = measure(function, benchmark_rows, repeat)
+
+        print(f"{name}: {results[name]['rows_per_second']:,.0f} rows/s", file=sys.stderr)
+
+    return results
+
+
+def compare(results, baseline):
+    """
+    print the throughput ratio of each benchmark to a baseline
+    """
+
+    for name, result in results["benchmarks"].items():
+
+        baseline_result = baseline["benchmarks"].get(name)
+
+        if baseline_result is None or not baseline_result["rows_per_second"]:
+            continue
+
+        ratio = result["rows_per_second"] / baseline_result["rows_per_second"]
+
+        print(f"{name}: {ratio:.2f}x ({baseline.get('commit')} -> {results.get('commit')})", file=sys.stderr)
+
+
+@click.command()
+@click.option("--host", default="localhost")
+@click.option("--port", default=5432)
+@click.option("--user", default="postgres")
+@click.option("--password", default=None)
+@click.option("--dbname", default="kam_benchmark", help="benchmark database, dropped and created again")
+@click.option("--rows", default=10000, help="validations seeded (credits, skills and assessments by fanout of 4)")
+@click.option("--repeat", default=5, help="runs per benchmark")
+@click.option("--slots", is_flag=True, default=False, help="generate compact models")
+@click.option("--output", "output_path", default=None, help="json results file (default: stdout)")
+@click.option("--baseline", "baseline_path", default=None, help="json results to compare with")
+@click.option("--keep", is_flag=True, default=False, help="keep the benchmark project and database")
+def benchmark(host, port, user, password, dbname, rows, repeat, slots, output_path, baseline_path, keep):
+
+    # read baseline before leaving the working directory
+    baseline = None
+
+    if baseline_path is not None:
+        with open(baseline_path, "r") as file:
+            baseline = json.load(file)
+
+    if output_path is not None:
+        output_path = os.path.abspath(output_path)
+
+    connection = dict(host=host, port=port, user=user, dbname=dbname)
+
+    if password is not None:
+        connection["password"] = password
+
+    working_directory = os.getcwd()
+    project_path = __create_project(connection)
+    models = None
+
+    try:
+
+        model_modules = __generate_models(slots)
+        models = [getattr(module, m) for module, (m, _, _) in zip(model_modules, MODELS)]
+
+        results = dict(
+            commit=__git_commit(),
+            date=datetime.now().isoformat(),
+            python=platform.python_version(),
+            rows=rows,
+            repeat=repeat,
+            slots=slots,
+            benchmarks=run_benchmarks(models, rows, repeat))
+
+    finally:
+
+        # close pooled connections before dropping the database (including when a benchmark fails)
+        if models is not None:
+
+            db = models[0].db
+            db.release_connection()
+            db.pool.close_all()
+
+        if not keep:
+            drop_database()
+
+        os.chdir(working_directory)
+
+        if not keep:
+            shutil.rmtree(project_path, ignore_errors=True)
+
+    # write results
+    if output_path is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(output_path, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is not None:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    benchmark()
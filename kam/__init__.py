@@ -0,0 +1,4 @@
+
+from kam.app.models.query_counter import (
+    assert_queries,
+    detect_n_plus_one)
@@ -1,16 +1,23 @@
 
 from kam.app.models.yaml_database import YamlDatabase
 from kam.app.models.sql_database import SqlDatabase
+from kam.app.models.notifications import logger
+from kam.app.models.active_record_schema import (
+    ActiveRecordSchema,
+    SCHEMA_CACHE_VERSION)
 
 from kam.app.helpers.file import (
+    get_project_directory,
     get_db_params_path,
-    get_db_migrations_path)
-
-from wagon_common.helpers.git.repo import get_git_top_level_directory
+    get_db_migrations_path,
+    schema_file_path,
+    schema_cache_file_path)
 
 import os
 import glob
+import json
 import yaml
+import hashlib
 
 import importlib
 
@@ -67,6 +74,81 @@ def instantiate_db(no_schema=False):
     return db_instance
 
 
+def load_schema():
+    """
+    load db/schema.py into the active record schema
+    """
+
+    # build schema location
+    schema_path = schema_file_path()
+
+    # build module name
+    module_name = schema_path.replace(os.sep, '.')
+
+    # load script
+    # from https://stackoverflow.com/questions/67631/how-to-import-a-module-given-the-full-path
+    spec = importlib.util.spec_from_file_location(module_name, schema_path)
+    module = importlib.util.module_from_spec(spec)
+
+    # run the schema
+    spec.loader.exec_module(module)
+
+    return ActiveRecordSchema.db_schema
+
+
+def migrations_checksum(migrations):
+    """
+    build checksum of migration timestamps
+    """
+
+    return hashlib.sha256(",".join(sorted(migrations)).encode()).hexdigest()
+
+
+def load_schema_cache():
+    """
+    load db/schema_cache.json into the active record schema
+    return False if the cache is missing or stale
+    """
+
+    # build schema cache location
+    schema_cache_path = schema_cache_file_path()
+
+    if not os.path.isfile(schema_cache_path):
+        return False
+
+    # read schema cache
+    with open(schema_cache_path, "r") as file:
+        schema_cache = json.load(file)
+
+    # check cache format
+    if schema_cache.get("version") != SCHEMA_CACHE_VERSION:
+        logger.info(f"# {schema_cache_path} version is outdated, loading db/schema.py")
+        return False
+
+    # check cache matches migrations (avoids a database round trip at startup)
+    code_migrations = [migration_timestamp(m) for m in retrieve_code_migrations()]
+
+    if schema_cache.get("migrations_checksum") != migrations_checksum(code_migrations):
+        logger.info(f"# {schema_cache_path} is stale, loading db/schema.py")
+        return False
+
+    # fill schema
+    ActiveRecordSchema.load(schema_cache["tables"])
+
+    return True
+
+
+def ensure_schema():
+    """
+    load the schema cache or db/schema.py on first use, once per process
+    """
+
+    if not ActiveRecordSchema.loaded and not load_schema_cache():
+        load_schema()
+
+    return ActiveRecordSchema.db_schema
+
+
 def drop_database():
     """
     drop database, no confirmations
@@ -109,6 +191,33 @@ def dump_schema():
     db_instance.dump_schema()
 
 
+def dump_schema_cache():
+    """
+    dump database schema cache in db/schema_cache.json
+    """
+
+    # create db instance
+    db_instance = instantiate_db()
+
+    # dump schema cache for the applied migrations
+    db_instance.dump_schema_cache(migrations_checksum(db_instance.migrations()))
+
+
+def clear_schema_cache():
+    """
+    remove db/schema_cache.json
+    """
+
+    # build schema cache location
+    schema_cache_path = schema_cache_file_path()
+
+    if os.path.isfile(schema_cache_path):
+
+        os.remove(schema_cache_path)
+
+        print(f"\n# removed {schema_cache_path}")
+
+
 def retrieve_code_migrations():
     """
     retrieve migrations list
@@ -232,6 +341,10 @@ def migrate():
     # update db schema
     dump_schema()
 
+    # update db schema cache if used
+    if os.path.isfile(schema_cache_file_path()):
+        dump_schema_cache()
+
 
 def seed():
     """
@@ -239,7 +352,7 @@ def seed():
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     # build seed location
     seed_path = os.path.relpath(os.path.join(
@@ -257,3 +370,72 @@ def seed():
 
     # run the seed
     spec.loader.exec_module(module)
+
+
+def __file_format(file_path, file_format):
+    """
+    retrieve file format from its extension if not provided
+    """
+
+    # use provided format
+    if file_format is not None:
+        return file_format
+
+    # use extension
+    extension = os.path.splitext(file_path)[1][1:].lower()
+
+    return "tsv" if extension == "tsv" else "csv"
+
+
+def __table_schema(table_name):
+    """
+    retrieve table columns from the db schema
+    """
+
+    # load schema on first use (keeps the schema loaded by the models)
+    db_schema = ensure_schema()
+
+    # validate table
+    if table_name not in db_schema:
+        raise ValueError(f"Invalid table {table_name}, not found in db/schema.py 🤒")
+
+    return db_schema[table_name]["columns"]
+
+
+def import_table(table_name, file_path, file_format=None):
+    """
+    stream a csv or tsv file into a table
+    """
+
+    # retrieve table schema
+    table_schema = __table_schema(table_name)
+
+    # create db instance
+    db_instance = instantiate_db()
+
+    # stream file
+    with open(file_path, "r", newline="") as file:
+        db_instance.copy_from(
+            table_name,
+            table_schema,
+            file,
+            file_format=__file_format(file_path, file_format))
+
+
+def export_table(table_name, file_path, file_format=None):
+    """
+    stream a table into a csv or tsv file
+    """
+
+    # validate table
+    __table_schema(table_name)
+
+    # create db instance
+    db_instance = instantiate_db()
+
+    # stream table
+    with open(file_path, "w", newline="") as file:
+        db_instance.copy_to(
+            table_name,
+            file,
+            file_format=__file_format(file_path, file_format))
@@ -33,7 +33,27 @@ TEMPLATE_MIGRATION_FILENAME = "migration.py"
 TEMPLATE_MODEL_FILENAME = "model.py"
 
 
-def __create_model_template(env, template_name, model_klass_name, instance_variable_types):
+def __model_slots(instance_variable_types):
+    """
+    build model instance slots (columns and references)
+    """
+
+    slots = ["id"]
+
+    for instance_variable, data_type in instance_variable_types.items():
+
+        # references are stored along with their id
+        if data_type == DATA_TYPE_REFERENCES:
+            slots += [f"{instance_variable}_id", instance_variable]
+        else:
+            slots.append(instance_variable)
+
+    slots += ["created_at", "updated_at"]
+
+    return slots
+
+
+def __create_model_template(env, template_name, model_klass_name, instance_variable_types, slots=False):
     """
     create model template file
     """
@@ -46,7 +66,8 @@ def __create_model_template(env, template_name, model_klass_name, instance_varia
         model_klass_name=model_klass_name,
         model_table_name=klass_name_to_table_name(model_klass_name),
         migration_klass_name=pluralize(model_klass_name),
-        instance_variable_types=instance_variable_types)
+        instance_variable_types=instance_variable_types,
+        slots=__model_slots(instance_variable_types) if slots else None)
 
     # select target file path
     target_file_path_function = {
@@ -66,10 +87,10 @@ def __create_model_template(env, template_name, model_klass_name, instance_varia
     print(f"# wrote {model_target_path}")
 
 
-def create(model_klass_name, instance_variables):
+def create(model_klass_name, instance_variables, slots=False):
     """
     validate model name and instance variables naming conventions
-    create model code file
+    create model code file (declaring __slots__ for compact instances if requested)
     create model migration
     """
 
@@ -108,4 +129,4 @@ def create(model_klass_name, instance_variables):
     __create_model_template(env, TEMPLATE_MIGRATION_FILENAME, model_klass_name, instance_variable_types)
 
     # create model code file
-    __create_model_template(env, TEMPLATE_MODEL_FILENAME, model_klass_name, instance_variable_types)
+    __create_model_template(env, TEMPLATE_MODEL_FILENAME, model_klass_name, instance_variable_types, slots=slots)
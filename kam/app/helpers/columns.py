@@ -0,0 +1,123 @@
+
+"""
+columnar results (numpy masked arrays and pandas data frames)
+numpy and pandas are optional dependencies: pip install "kam[analytics]"
+"""
+
+from datetime import timezone
+
+import importlib
+
+
+KAM_TO_NUMPY_DATATYPE = dict(
+    string="object",
+    text="object",
+    integer="int64",
+    float="float64",
+    boolean="bool",
+    datetime="datetime64[us]")
+
+# values replacing nulls (masked) in arrays without missing values
+NULL_FILL_VALUES = dict(
+    integer=0,
+    float=0.0,
+    boolean=False)
+
+
+def __import(module_name):
+    """
+    import optional dependency
+    """
+
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise ImportError(f"Missing {module_name} for columnar results, install kam[analytics] 🤒")
+
+
+def __column_chunk(np, values, data_type):
+    """
+    convert the values of a column chunk to an array and its null mask
+    """
+
+    # build null mask
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+
+    # replace nulls
+    if data_type in NULL_FILL_VALUES and mask.any():
+        fill_value = NULL_FILL_VALUES[data_type]
+        values = [fill_value if v is None else v for v in values]
+
+    # numpy datetimes are naive
+    if data_type == "datetime":
+        values = [v.astimezone(timezone.utc).replace(tzinfo=None) if v is not None and v.tzinfo is not None else v
+                  for v in values]
+
+    array = np.array(values, dtype=KAM_TO_NUMPY_DATATYPE.get(data_type, "object"))
+
+    return array, mask
+
+
+def rows_to_columns(batches, columns, column_types):
+    """
+    convert batches of row tuples to a dict of masked arrays by column
+    rows are only kept for the current batch
+    """
+
+    np = __import("numpy")
+
+    # convert batches
+    chunks = {column: [] for column in columns}
+
+    for batch_rows in batches:
+
+        for index, column in enumerate(columns):
+
+            values = [row[index] for row in batch_rows]
+            chunks[column].append(__column_chunk(np, values, column_types[column]))
+
+    # concatenate chunks
+    arrays = {}
+
+    for column in columns:
+
+        data_type = KAM_TO_NUMPY_DATATYPE.get(column_types[column], "object")
+
+        if len(chunks[column]) == 0:
+            arrays[column] = np.ma.MaskedArray(np.array([], dtype=data_type), mask=np.array([], dtype=bool))
+            continue
+
+        arrays[column] = np.ma.MaskedArray(
+            np.concatenate([array for array, _ in chunks[column]]),
+            mask=np.concatenate([mask for _, mask in chunks[column]]))
+
+    return arrays
+
+
+def columns_to_dataframe(arrays, column_types):
+    """
+    convert masked arrays to a data frame, nulls becoming missing values
+    """
+
+    pd = __import("pandas")
+
+    series = {}
+
+    for column, array in arrays.items():
+
+        data_type = column_types[column]
+        mask = array.mask
+
+        # integer and boolean columns use nullable arrays
+        if not mask.any():
+            series[column] = array.data
+        elif data_type == "integer":
+            series[column] = pd.arrays.IntegerArray(array.data, mask)
+        elif data_type == "boolean":
+            series[column] = pd.arrays.BooleanArray(array.data, mask)
+        elif data_type == "float":
+            series[column] = array.filled(float("nan"))
+        else:
+            series[column] = array.data  # nulls are None or NaT
+
+    return pd.DataFrame(series, columns=list(arrays.keys()))
@@ -30,6 +30,86 @@ def retrieve_table_alias(source_table_name, through):
     return aliases[0], aliases[1:]
 
 
+# comparison operators of where conditions ("not" negates any condition)
+WHERE_OPERATORS = {
+    "eq": "=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "like": "LIKE",
+    "not": "NOT"}
+
+
+def where_condition(column, value):
+    """
+    return the sql condition on a column expression along with its bound params
+    values: None (IS NULL), lists (= ANY), ranges (>= start AND < stop),
+    dicts of operators (dict(gte=2020, lt=2023), {"not": None}) or values (=)
+    """
+
+    # null
+    if value is None:
+        return f"{column} IS NULL", []
+
+    # range of integers
+    if isinstance(value, range):
+
+        if value.step != 1:
+            raise ValueError(f"Invalid range {value} for {column}, ranges need a step of 1 🤒")
+
+        return f"({column} >= %s AND {column} < %s)", [value.start, value.stop]
+
+    # list of values, with or without null
+    if isinstance(value, (list, tuple, set)):
+
+        values = [v for v in value if v is not None]
+
+        if len(values) == len(value):
+            return f"{column} = ANY(%s)", [values]
+
+        return f"({column} = ANY(%s) OR {column} IS NULL)", [values]
+
+    # scalar value
+    if not isinstance(value, dict):
+        return f"{column} = %s", [value]
+
+    # operators
+    conditions = []
+    params = []
+
+    for operator, operand in value.items():
+
+        if operator not in WHERE_OPERATORS:
+            raise ValueError(f"Invalid operator {operator} for {column}, supported: {', '.join(WHERE_OPERATORS)} 🤒")
+
+        if operator in ["eq", "not"]:
+
+            condition, condition_params = where_condition(column, operand)
+
+            if operator == "not":
+                condition = f"NOT ({condition})"
+
+        elif operand is None or isinstance(operand, (list, tuple, set, range, dict)):
+
+            raise ValueError(f"Invalid value {operand} for {column} {operator}, expected a single value 🤒")
+
+        else:
+
+            condition, condition_params = f"{column} {WHERE_OPERATORS[operator]} %s", [operand]
+
+        conditions.append(condition)
+        params += condition_params
+
+    if len(conditions) == 0:
+        raise ValueError(f"Missing operator for {column} 🤒")
+
+    if len(conditions) == 1:
+        return conditions[0], params
+
+    return "(" + " AND ".join(conditions) + ")", params
+
+
 if __name__ == '__main__':
 
     source_alias, through_alias = retrieve_table_alias(
@@ -3,6 +3,7 @@ import os
 import yaml
 
 from datetime import datetime
+from functools import lru_cache
 
 from kam.app.helpers.grammar import (
     singularize)
@@ -13,6 +14,15 @@ from kam.app.helpers.noun import (
 from wagon_common.helpers.git.repo import get_git_top_level_directory
 
 
+@lru_cache(maxsize=None)
+def get_project_directory():
+    """
+    return project top level directory, cached per process (runs git)
+    """
+
+    return get_git_top_level_directory()
+
+
 def get_app_directory_path():
     """
     return app directory
@@ -32,7 +42,7 @@ def get_app_directory_path():
     app_directory = app_conf.get("app_directory", "app")
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     # build app path
     app_directory_path = os.path.relpath(
@@ -49,7 +59,7 @@ def get_app_params_path():
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     return os.path.relpath(os.path.join(
         tld,
@@ -62,7 +72,7 @@ def get_db_params_path():
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     return os.path.relpath(os.path.join(
         tld,
@@ -76,7 +86,7 @@ def get_db_migrations_path():
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     return os.path.relpath(os.path.join(
         tld,
@@ -130,7 +140,7 @@ def model_migration_file_path(model_name):
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     return os.path.relpath(os.path.join(
         tld,
@@ -145,9 +155,37 @@ def schema_file_path():
     """
 
     # retrieve project top level directory
-    tld = get_git_top_level_directory()
+    tld = get_project_directory()
 
     return os.path.relpath(os.path.join(
         tld,
         "db",
         "schema.py"))
+
+
+def schema_cache_file_path():
+    """
+    build schema cache file path
+    """
+
+    # retrieve project top level directory
+    tld = get_project_directory()
+
+    return os.path.relpath(os.path.join(
+        tld,
+        "db",
+        "schema_cache.json"))
+
+
+def log_file_path(file_name):
+    """
+    build log file path
+    """
+
+    # retrieve project top level directory
+    tld = get_project_directory()
+
+    return os.path.relpath(os.path.join(
+        tld,
+        "log",
+        file_name))
@@ -1,223 +1,363 @@
 
-from kam.app.controllers.database_controller import instantiate_db
+from kam.app.controllers.database_controller import (
+    instantiate_db,
+    ensure_schema)
 from kam.app.models.active_record_schema import ActiveRecordSchema
+from kam.app.models.model_registry import REGISTRY
+from kam.app.models.model_initializer import (
+    build_initializer,
+    build_loader)
+from kam.app.models.relation import Relation
+from kam.app.models.notifications import logger
 
-from kam.app.helpers.grammar import (
-    singularize,
-    is_plural)
+import types
+import threading
 
-from kam.app.helpers.noun import (
-    table_ref_to_klass_name,
-    klass_name_to_table_ref)
+from contextlib import contextmanager
 
-from kam.app.helpers.file import (
-    klass_name_to_table_name,
-    schema_file_path)
 
-import os
+class LazyDatabase():
+    """
+    resolve the application database on first access, once per process
+    """
 
-import importlib
+    def __init__(self):
+
+        self.db = None
+        self.lock = threading.Lock()
+
+    def __get__(self, instance, owner):
+
+        if self.db is None:
+
+            with self.lock:
+
+                # read config/database.yml
+                if self.db is None:
+                    self.db = instantiate_db()
+
+        return self.db
+
+
+class ReferenceSlot():
+    """
+    reference slot of compact models, returning the relation method until a reference is assigned
+    """
+
+    def __init__(self, slot, method):
+
+        self.slot = slot
+        self.method = method
+
+    def __get__(self, instance, owner):
+
+        if instance is None:
+            return self
+
+        try:
+            return self.slot.__get__(instance, owner)
+        except AttributeError:
+            return self.method.__get__(instance, owner)
+
+    def __set__(self, instance, value):
+
+        self.slot.__set__(instance, value)
+
+    def __delete__(self, instance):
+
+        self.slot.__delete__(instance)
 
 
 class ActiveRecord():
 
-    # retrieve db connection
-    db = instantiate_db()
+    # record state (models declaring __slots__ list their columns and references)
+    __slots__ = ("preloaded_relations", "original_attributes", "previous_changes")
+
+    # retrieve db connection on first use
+    db = LazyDatabase()
 
-    def __load_db_schema():
+    # loaded records are set by a compiled loader unless the model sets per instance state in __init__
+    init_loaded_records = False
+
+    def __init_subclass__(cls, **kwargs):
+
+        super().__init_subclass__(**kwargs)
+
+        # register model names once per klass
+        REGISTRY.register(cls)
+
+    def __init__(self, **kwargs):
+
+        # declare the relations of the model once per klass
+        type(self).__declare_relations()
+
+        # set columns, references and tracked changes (compiled once per model)
+        type(self).__initializer()(self, kwargs)
+
+    @classmethod
+    def relations(cls):
         """
-        load schema into class variable
+        declare the belongs_to and has_many relations of the model
+        called once per klass, before its first record is built
         """
 
-        # build seed location
-        schema_path = schema_file_path()
+        pass
 
-        # build module name
-        module_name = schema_path.replace(os.sep, '.')
+    @classmethod
+    def __declare_relations(cls):
+        """
+        call the relations declaration of the model on first use
+        """
 
-        # load script
-        # from https://stackoverflow.com/questions/67631/how-to-import-a-module-given-the-full-path
-        spec = importlib.util.spec_from_file_location(module_name, schema_path)
-        module = importlib.util.module_from_spec(spec)
+        model = REGISTRY.model(cls)
 
-        # run the seed
-        spec.loader.exec_module(module)
+        if not model["initialized"]:
 
-    # db schema
-    db_schema = __load_db_schema()
+            model["initialized"] = True
+            cls.relations()
 
-    del __load_db_schema  # delete tmp function
+    @classmethod
+    def __initializer(cls):
+        """
+        return the instance initializer of the model, compiled on first use
+        """
 
-    def __init__(self, **kwargs):
+        model = REGISTRY.model(cls)
 
-        # retrieve db connection
-        # self.db = instantiate_db()
+        # compile initializer from the current table definition
+        if model["initializer"] is None or model["schema_generation"] != ActiveRecordSchema.generation:
+            model["initializer"] = build_initializer(cls.table_definition())
 
-        # relations
-        self.one_relation = []
-        self.many_relations = []
+        return model["initializer"]
 
-        # get child class name
-        child_klass_name = type(self).__name__
-        table_name = klass_name_to_table_name(child_klass_name)
+    @classmethod
+    def __loader(cls, columns):
+        """
+        return the loader of the rows of a result set, compiled once per selected columns
+        """
+
+        model = REGISTRY.model(cls)
+        table_definition = cls.table_definition()
+
+        loader = model["loaders"].get(columns)
+
+        if loader is None:
+            loader = build_loader(cls, table_definition, columns)
+            model["loaders"][columns] = loader
+
+        return loader
+
+    @classmethod
+    def instantiate(cls, columns, rows):
+        """
+        return model instances of rows fetched as tuples in the order of columns
+        records bypass __init__ unless the model sets init_loaded_records to True
+        """
+
+        # build instances through __init__
+        if cls.init_loaded_records:
+            return [cls.__loaded(**dict(zip(columns, row))) for row in rows]
+
+        records = []
+
+        # models declaring their relations in __init__ build their first record through it
+        if not REGISTRY.model(cls)["initialized"] and cls.__init__ is not ActiveRecord.__init__ and len(rows) > 0:
+            records.append(cls.__loaded(**dict(zip(columns, rows[0]))))
+            rows = rows[1:]
+
+        # declare relations once per klass
+        cls.__declare_relations()
+
+        return records + cls.__loader(columns)(rows)
+
+    @classmethod
+    def __loaded(cls, **kwargs):
+        """
+        return a record built through __init__ from a loaded row
+        """
+
+        record = cls(**kwargs)
+
+        # track changes from the persisted values
+        record.__snapshot()
+
+        return record
+
+    def __tracked_columns(self):
+        """
+        return the columns whose changes are tracked
+        """
 
         # retrieve table schema
-        table_schema = ActiveRecordSchema.db_schema[table_name]["columns"]
-        table_constraints = ActiveRecordSchema.db_schema[table_name]["constraints"]
+        table_schema = type(self).table_schema()
 
-        # # build list of allowed instance variables
-        # unallowed_variables = {"id", "created_at", "updated_at", "timestamps"}
-        # allowed_variables = set(table_schema.keys()) - unallowed_variables
+        return [c for c in table_schema.keys() if c != "timestamps"]
 
-        # iterate through instance variables
-        # for variable in allowed_variables:
-        for variable in table_schema.keys():
+    def __snapshot(self):
+        """
+        store the persisted column values
+        """
 
-            # check if variable was provided to constructor
-            setattr(self, variable, kwargs.get(variable))
+        self.original_attributes = {c: getattr(self, c) for c in self.__tracked_columns()}
 
-        # handle references
-        for constraint, _ in table_constraints.items():
+    def __changes_applied(self):
+        """
+        move changes to previous changes once persisted
+        """
 
-            # check constraint naming
-            if constraint[-3:] != "_id":
+        self.previous_changes = self.changes
+        self.__snapshot()
 
-                continue
+    @property
+    def changed(self):
+        """
+        return the columns changed since the record was loaded or saved
+        """
 
-            # get reference
-            reference = constraint[:-3]
+        return [c for c, v in self.original_attributes.items() if getattr(self, c) != v]
 
-            # check if reference is provided
-            if reference in kwargs.keys():
+    @property
+    def changes(self):
+        """
+        return the (original, current) values of the changed columns
+        """
 
-                # check if variable was provided to constructor
-                value = kwargs.get(reference)
-                setattr(self, reference, value)
-                setattr(self, f"{reference}_id", value.id)
+        return {c: (self.original_attributes[c], getattr(self, c)) for c in self.changed}
 
     # references
     one = {}
     many = {}
 
+    # records saved within the running units of work of each thread
+    threads_units_of_work = threading.local()
+
     @classmethod
-    def __get_model_klass(self, model_name):
+    def units_of_work(cls):
+        """
+        return the running units of work of the current thread
+        """
 
-        model_sing_name = singularize(model_name) if is_plural(model_name) else model_name
+        units_of_work = getattr(ActiveRecord.threads_units_of_work, "stack", None)
 
-        # build class name
-        klass_name = table_ref_to_klass_name(model_sing_name)
+        if units_of_work is None:
+            units_of_work = []
+            ActiveRecord.threads_units_of_work.stack = units_of_work
 
-        # build module name
-        klass_module_name = ".".join(self.__module__.split(".")[:-1] + [model_sing_name])
+        return units_of_work
 
-        # import module
-        klass_module = importlib.import_module(klass_module_name)
+    @classmethod
+    def __get_model_klass(cls, model_name):
 
-        # get klass
-        model_klass = getattr(klass_module, klass_name)
+        # retrieve registered klass (imported from the model package on first use)
+        return REGISTRY.klass(model_name, cls.__module__)
 
-        return model_klass
+    @classmethod
+    def belongs_to(cls, model_name, through=None):
 
-    def belongs_to(self, model_name, through=None):
+        klass_ones = cls.one.setdefault(cls.__name__, {})
 
-        # get model klass
-        model_klass = self.__get_model_klass(model_name)
+        # store reference once per klass
+        if model_name not in klass_ones.keys():
 
-        # store reference
-        child_klass_name = type(self).__name__
-        klass_ones = self.one.get(child_klass_name, {})
-        klass_ones[model_name] = dict(
-            klass=model_klass,
-            through=through)
-        self.one[child_klass_name] = klass_ones
+            # get model klass
+            model_klass = cls.__get_model_klass(model_name)
 
-        # store relation
-        self.one_relation.append(model_name)
+            klass_ones[model_name] = dict(
+                klass=model_klass,
+                through=through)
 
-        # add missing method
-        has_many_function = self.__add_missing_method(model_name)
-        setattr(self, model_name, has_many_function)
+            # add missing method
+            cls.__add_missing_method(model_name)
 
-    def has_many(self, model_names, through=None):
+    @classmethod
+    def has_many(cls, model_names, through=None):
 
-        # get model klass
-        model_name = singularize(model_names)
-        model_klass = self.__get_model_klass(model_name)
+        klass_manys = cls.many.setdefault(cls.__name__, {})
 
-        # store reference
-        child_klass_name = type(self).__name__
-        klass_manys = self.many.get(child_klass_name, {})
-        klass_manys[model_names] = dict(
-            klass=model_klass,
-            through=through)
-        self.many[child_klass_name] = klass_manys
+        # store reference once per klass
+        if model_names not in klass_manys.keys():
 
-        # store relation
-        self.many_relations.append(model_names)
+            # get model klass
+            model_name = REGISTRY.table_ref(model_names)
+            model_klass = cls.__get_model_klass(model_name)
 
-        # add missing method
-        has_many_function = self.__add_missing_method(model_names)
-        setattr(self, model_names, has_many_function)
+            klass_manys[model_names] = dict(
+                klass=model_klass,
+                through=through)
 
-    def __add_missing_method(self, name):
+            # add missing method
+            cls.__add_missing_method(model_names)
+
+    @classmethod
+    def __add_missing_method(cls, name):
         """
-        handle missing method calls for belongs_to and has_many relationships
+        add the belongs_to or has_many relationship method shared by the model instances
+        (instance references, when provided, take precedence over the method)
         """
 
-        def _missing(*args, **kwargs):
+        def _missing(self, *args, **kwargs):
             """
-            call relation method if it exists
+            call relation method
             """
 
-            # look out for belongs_to relationships
-            relation_model = None
-            child_klass_name = type(self).__name__
+            return self.__relation(name)
+
+        # compact models keep storing references in their slot
+        slot = getattr(cls, name, None)
+
+        if isinstance(slot, types.MemberDescriptorType):
+            setattr(cls, name, ReferenceSlot(slot, _missing))
+        else:
+            setattr(cls, name, _missing)
 
-            # retrieve reference klasses
-            klass_ones = self.one.get(child_klass_name, {})
-            klass_manys = self.many.get(child_klass_name, {})
+    def __relation(self, name):
+        """
+        return the records of a belongs_to or has_many relationship
+        """
+
+        # look out for belongs_to relationships
+        relation_model = None
+        child_klass_name = type(self).__name__
 
-            if name in klass_ones.keys():
+        # retrieve reference klasses
+        klass_ones = self.one.get(child_klass_name, {})
+        klass_manys = self.many.get(child_klass_name, {})
 
-                # retrieve relation model
-                relation_model = klass_ones[name]
+        if name in klass_ones.keys():
 
-            elif name in klass_manys.keys():
+            # retrieve relation model
+            relation_model = klass_ones[name]
 
-                # retrieve relation model
-                relation_model = klass_manys[name]
+        elif name in klass_manys.keys():
 
-            else:
+            # retrieve relation model
+            relation_model = klass_manys[name]
 
-                # alert missing method
-                raise ValueError(f"Missing method {name} for {self}, {args}, {kwargs} 🤒")
+        else:
 
-            # check if a relation exists
-            if relation_model is not None:
+            # alert missing method
+            raise ValueError(f"Missing method {name} for {self} 🤒")
 
-                # retrieve klass
-                relation_klass = relation_model["klass"]
-                relation_through = relation_model["through"]
+        # check if the relation was eager loaded
+        if self.preloaded_relations is not None and name in self.preloaded_relations.keys():
 
-                if relation_through is None:
-                    relation_through = [name]
+            return self.preloaded_relations[name]
 
-                # build class id
-                klass_name = type(self).__name__
-                klass_rel = klass_name_to_table_ref(klass_name)
+        # retrieve klass
+        relation_through = relation_model["through"]
 
-                # retrieve linked objects
-                relations = self.where(
-                    **dict(id=self.id),
-                    through=relation_through)  # + [name])
+        if relation_through is None:
+            relation_through = [name]
 
-                # fill self reference
-                for relation in relations:
-                    setattr(relation, klass_rel, self)
+        # build class id
+        klass_rel = REGISTRY.model(type(self))["table_ref"]
 
-                return relations
+        # retrieve linked objects, filling self reference once loaded
+        relations = self.where(
+            **dict(id=self.id),
+            through=relation_through).owned_by(klass_rel, self, association=name)
 
-        return _missing
+        return relations
 
     def _repr_html_(self):
         """
@@ -235,81 +375,201 @@ class ActiveRecord():
         """
 
         # get child class name
-        child_klass_name = cls.__name__
-        table_name = klass_name_to_table_name(child_klass_name)
+        table_name = cls.table_name()
 
-        print(f"\ndestroy all {table_name}...")
+        logger.info("destroy all %s...", table_name)
 
         cls.db.destroy_all(table_name)
 
     @classmethod
-    def all(cls):
+    def table_name(cls):
         """
-        return all rows
+        return model table name
         """
 
-        # get child class name
-        child_klass_name = cls.__name__
-        table_name = klass_name_to_table_name(child_klass_name)
+        return REGISTRY.model(cls)["table_name"]
+
+    @classmethod
+    def table_schema(cls):
+        """
+        return model table columns
+        """
 
-        print(f"\nreturn all rows from {table_name}...")
+        return cls.table_definition()["columns"]
 
-        # retrieve rows
-        all_rows = cls.db.select_all(table_name)
+    @classmethod
+    def table_definition(cls):
+        """
+        return model table columns and constraints, loading the schema on first use
+        """
+
+        model = REGISTRY.model(cls)
+
+        # retrieve table definition once per schema load
+        if model["schema_generation"] != ActiveRecordSchema.generation:
 
-        # convert rows to model instances
-        converted_rows = [cls(**row) for row in all_rows]
+            model["definition"] = ensure_schema()[model["table_name"]]
+            model["schema_generation"] = ActiveRecordSchema.generation
+            model["initializer"] = None
+            model["loaders"] = {}
 
-        return converted_rows
+        return model["definition"]
+
+    @classmethod
+    def establish_connection(cls):
+        """
+        load the schema and connect to the database ahead of the first query
+        """
+
+        ensure_schema()
+        cls.db.establish_connection()
+
+    @classmethod
+    def all(cls):
+        """
+        return lazy relation over all rows
+        """
+
+        # get child class name
+        table_name = cls.table_name()
+
+        logger.debug("return all rows from %s...", table_name)
+
+        return Relation(cls)
 
     @classmethod
     def where(cls, through=[], **kwargs):
         """
-        return matching rows
+        return lazy relation over matching rows
         """
 
         # get child class name
-        child_klass_name = cls.__name__
-        table_name = klass_name_to_table_name(child_klass_name)
+        table_name = cls.table_name()
 
-        print(f"\nreturn matching rows for {kwargs} from {table_name}...")
+        logger.debug("return matching rows for %s from %s...", kwargs, table_name)
 
-        # retrieve table schema
-        table_schema = ActiveRecordSchema.db_schema[table_name]["columns"]
+        # get target model klass
+        model_klass = cls if len(through) == 0 else cls.__get_model_klass(through[-1])
 
-        # retrieve rows
-        matching_rows, target_table = cls.db.select_where(
-            table_name, table_schema, **kwargs, through=through)
+        return Relation(cls, model_klass=model_klass, through=through, conditions=kwargs)
 
-        # get model klass
-        model_klass = cls.__get_model_klass(target_table)
+    @classmethod
+    def select(cls, *columns):
+        """
+        return lazy relation over all rows retrieving only some columns
+        """
 
-        # convert rows to model instances
-        converted_rows = [model_klass(**row) for row in matching_rows]
+        return cls.all().select(*columns)
 
-        return converted_rows
+    @classmethod
+    def pluck(cls, *columns):
+        """
+        return the column values of all rows as tuples
+        """
 
-    def save(self):
+        return cls.all().pluck(*columns)
+
+    @classmethod
+    def group(cls, *columns):
         """
-        insert or update row
+        return lazy relation computing aggregates by groups of column values
         """
 
-        # get child class name
-        child_klass_name = type(self).__name__
-        table_name = klass_name_to_table_name(child_klass_name)
+        return cls.all().group(*columns)
+
+    @classmethod
+    def count(cls, column=None):
+        """
+        return the number of rows
+        """
+
+        return cls.all().count(column)
+
+    @classmethod
+    def exists(cls):
+        """
+        determines whether the table has rows
+        """
+
+        return cls.all().exists()
+
+    @classmethod
+    def sum(cls, column):
+        """
+        return the sum of a column
+        """
+
+        return cls.all().sum(column)
+
+    @classmethod
+    def average(cls, column):
+        """
+        return the average of a column
+        """
+
+        return cls.all().average(column)
+
+    @classmethod
+    def minimum(cls, column):
+        """
+        return the minimum of a column
+        """
+
+        return cls.all().minimum(column)
+
+    @classmethod
+    def maximum(cls, column):
+        """
+        return the maximum of a column
+        """
+
+        return cls.all().maximum(column)
+
+    @classmethod
+    def includes(cls, *names):
+        """
+        return lazy relation over all rows eager loading relations
+        """
+
+        return cls.all().includes(*names)
+
+    @classmethod
+    def find_in_batches(cls, batch_size=1000):
+        """
+        yield lists of rows streamed in batches
+        """
+
+        return cls.all().find_in_batches(batch_size=batch_size)
+
+    @classmethod
+    def find_each(cls, batch_size=1000):
+        """
+        yield rows streamed in batches
+        """
+
+        return cls.all().find_each(batch_size=batch_size)
+
+    def __save_columns(self):
+        """
+        return the column values to persist
+        """
 
         # retrieve table schema
-        table_schema = ActiveRecordSchema.db_schema[table_name]["columns"]
-        table_constraints = ActiveRecordSchema.db_schema[table_name]["constraints"]
+        table_definition = type(self).table_definition()
+        table_schema = table_definition["columns"]
+        table_constraints = table_definition["constraints"]
 
         # remove id from columns
         ignored_instance_variables = [
             "id",
-            "one_relation",
-            "many_relations",
             "timestamps"]
 
-        cols = {k: v for k, v in self.__dict__.items() if k not in ignored_instance_variables and k in table_schema.keys()}
+        cols = {k: getattr(self, k) for k in table_schema.keys() if k not in ignored_instance_variables}
+
+        # retrieve relations
+        child_klass_name = type(self).__name__
+        klass_ones = self.one.get(child_klass_name, {})
+        klass_manys = self.many.get(child_klass_name, {})
 
         # replace references
         valid_cols = {}
@@ -317,12 +577,12 @@ class ActiveRecord():
         for column, value in cols.items():
 
             # ignore one relations
-            if column in self.one_relation:
+            if column in klass_ones.keys():
 
                 continue
 
             # ignore many relations
-            if column in self.many_relations:
+            if column in klass_manys.keys():
 
                 continue
 
@@ -343,13 +603,265 @@ class ActiveRecord():
             # append value
             valid_cols[column] = value
 
+        return valid_cols
+
+    def __changed_columns(self):
+        """
+        return the changed column values to persist
+        """
+
+        changed = self.changed
+
+        return {k: v for k, v in self.__save_columns().items() if k in changed}
+
+    @classmethod
+    def insert_all(cls, rows, returning_ids=True, batch_size=1000):
+        """
+        insert rows (dicts of attributes or model instances) in multi row batches
+        within a single transaction, filling the ids of the inserted model instances
+        """
+
+        # get child class name
+        table_name = cls.table_name()
+
+        logger.info("insert %s rows into %s...", len(rows), table_name)
+
+        # convert attributes to model instances
+        records = [row if isinstance(row, ActiveRecord) else cls(**row) for row in rows]
+
+        # insert rows
+        ids = cls.db.insert_all(
+            table_name,
+            cls.table_schema(),
+            [record.__save_columns() for record in records],
+            returning_ids=returning_ids,
+            batch_size=batch_size)
+
+        # fill inserted ids
+        if returning_ids:
+            for record, id in zip(records, ids):
+                record.id = id
+                record.__changes_applied()
+
+        return ids
+
+    @classmethod
+    def upsert_all(cls, rows, unique_by, update_columns=None, returning_ids=True, batch_size=1000):
+        """
+        insert rows (dicts of attributes or model instances) or update the rows
+        conflicting on the unique_by columns, which require a unique index
+        """
+
+        # get child class name
+        table_name = cls.table_name()
+
+        logger.info("upsert %s rows into %s...", len(rows), table_name)
+
+        # convert attributes to model instances
+        records = [row if isinstance(row, ActiveRecord) else cls(**row) for row in rows]
+
+        # retrieve column values, keeping ids when used as unique key
+        records_columns = []
+
+        for record in records:
+
+            columns = record.__save_columns()
+
+            if "id" in unique_by:
+                columns["id"] = record.id
+
+            records_columns.append(columns)
+
+        # upsert rows
+        ids = cls.db.upsert_all(
+            table_name,
+            cls.table_schema(),
+            records_columns,
+            unique_by,
+            update_columns=update_columns,
+            returning_ids=returning_ids,
+            batch_size=batch_size)
+
+        # fill upserted ids
+        if returning_ids:
+            for record, id in zip(records, ids):
+                if id is not None:
+                    record.id = id
+                    record.__changes_applied()
+
+        return ids
+
+    @classmethod
+    def connection(cls):
+        """
+        check out a database connection for the current thread during the block
+        (pooled connections are otherwise held by the thread until released)
+        """
+
+        return cls.db.connection()
+
+    @classmethod
+    def release_connection(cls):
+        """
+        return the database connection of the current thread to the pool
+        """
+
+        cls.db.release_connection()
+
+    @classmethod
+    @contextmanager
+    def transaction(cls, unit_of_work=False):
+        """
+        run saves in a single transaction committed at the end, nested transactions use savepoints
+        in unit of work mode saved records are collected and flushed in batched statements on exit
+        """
+
+        with cls.db.transaction():
+
+            # plain transaction
+            if not unit_of_work:
+
+                yield
+                return
+
+            # collect saved records (by identity, in saving order)
+            cls.units_of_work().append({})
+
+            try:
+
+                yield
+
+            finally:
+
+                records = cls.units_of_work().pop()
+
+            # flush records within the transaction
+            cls.__flush(list(records.values()))
+
+    @classmethod
+    def __flush_order(cls, klasses):
+        """
+        order klasses so that referenced tables are written first (references need their ids)
+        klasses referencing each other keep their saving order
+        """
+
+        # retrieve the tables referenced by each klass
+        table_names = {klass: klass.table_name() for klass in klasses}
+        referenced_tables = {
+            klass: set(klass.table_definition()["constraints"].values()) - {table_names[klass]}
+            for klass in klasses}
+
+        ordered_klasses = []
+        remaining_klasses = list(klasses)
+
+        while len(remaining_klasses) > 0:
+
+            # tables of the klasses left to write
+            remaining_tables = {table_names[klass] for klass in remaining_klasses}
+
+            # first klass whose references are written
+            klass = next(
+                (k for k in remaining_klasses if len(referenced_tables[k] & remaining_tables) == 0),
+                remaining_klasses[0])
+
+            ordered_klasses.append(klass)
+            remaining_klasses.remove(klass)
+
+        return ordered_klasses
+
+    @classmethod
+    def __flush(cls, records):
+        """
+        write the records of a unit of work, by model klass
+        klasses are flushed after the klasses they reference, otherwise in saving order
+        """
+
+        # group records by klass
+        klass_records = {}
+
+        for record in records:
+            klass_records.setdefault(type(record), []).append(record)
+
+        for klass in cls.__flush_order(list(klass_records.keys())):
+
+            records = klass_records[klass]
+
+            # retrieve table schema
+            table_name = klass.table_name()
+            table_schema = klass.table_schema()
+            table_constraints = klass.table_definition()["constraints"]
+
+            # refresh references to records inserted earlier in the flush
+            for record in records:
+                for constraint in table_constraints.keys():
+
+                    reference = getattr(record, constraint[:-3], None)
+
+                    if constraint[-3:] == "_id" and isinstance(reference, ActiveRecord):
+                        setattr(record, constraint, reference.id)
+
+            # split new and persisted records
+            new_records = []
+            persisted_records = []
+
+            for record in records:
+                if record.id is None:
+                    new_records.append(record)
+                else:
+                    persisted_records.append(record)
+
+            # insert new records
+            if len(new_records) > 0:
+                klass.insert_all(new_records)
+
+            # update the changed columns of persisted records
+            if len(persisted_records) > 0:
+                klass.db.update_all(
+                    table_name,
+                    table_schema,
+                    [(record.id, record.__changed_columns()) for record in persisted_records])
+
+                for record in persisted_records:
+                    record.__changes_applied()
+
+    def save(self):
+        """
+        insert or update row
+        """
+
+        # defer write to the running unit of work
+        units_of_work = self.units_of_work()
+
+        if len(units_of_work) > 0:
+
+            units_of_work[-1][id(self)] = self
+
+            return
+
+        # get child class name
+        table_name = type(self).table_name()
+
+        # retrieve table schema
+        table_schema = type(self).table_schema()
+
         # check whether object was persisted
         if self.id is None:
 
             # insert object
-            self.db.insert(table_name, table_schema, self, valid_cols)
+            self.db.insert(table_name, table_schema, self, self.__save_columns())
 
         else:
 
+            # retrieve changed column values
+            valid_cols = self.__changed_columns()
+
+            # skip round trip if nothing changed
+            if len(valid_cols) == 0:
+
+                self.previous_changes = {}
+                return
+
             # update object
             self.db.update(table_name, table_schema, self.id, valid_cols)
+
+        self.__changes_applied()
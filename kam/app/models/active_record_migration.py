@@ -20,8 +20,46 @@ class ActiveRecordMigration():
         called by the child class if the migration creates a table
         """
 
-        # create table
+        # create table (references are indexed)
         self.db_instance.create_table(table_name, columns)
 
         # no exception was encountered
         self.migration_successful = True
+
+    def change_reference(self, table_name, reference, null=False, on_delete=None):
+        """
+        called by the child class if the migration changes a reference
+        converts references created as BIGSERIAL to BIGINT (on_delete: cascade, nullify or restrict)
+        """
+
+        # change reference
+        self.db_instance.change_reference(table_name, reference, null=null, on_delete=on_delete)
+
+        # no exception was encountered
+        self.migration_successful = True
+
+    def add_index(self, table_name, columns, unique=False, name=None, where=None, concurrently=False):
+        """
+        called by the child class if the migration creates an index
+        unique indexes are required by upsert_all unique_by columns
+        where is the sql predicate of a partial index
+        concurrently builds the index without locking writes (outside of transactions)
+        """
+
+        # create index
+        self.db_instance.add_index(
+            table_name, columns, unique=unique, name=name, where=where, concurrently=concurrently)
+
+        # no exception was encountered
+        self.migration_successful = True
+
+    def remove_index(self, table_name, columns=None, name=None, concurrently=False):
+        """
+        called by the child class if the migration removes an index
+        """
+
+        # drop index
+        self.db_instance.remove_index(table_name, columns=columns, name=name, concurrently=concurrently)
+
+        # no exception was encountered
+        self.migration_successful = True
@@ -1,8 +1,16 @@
 
+# format version of db/schema_cache.json
+SCHEMA_CACHE_VERSION = 1
+
+
 class ActiveRecordSchema():
 
     # database schema
     db_schema = {}
+    loaded = False
+
+    # incremented on each schema load
+    generation = 0
 
     @classmethod
     def define(cls, definition_function):
@@ -13,7 +21,11 @@ class ActiveRecordSchema():
         # call definition function
         definition_function(ar_schema)
 
-    def create_table(self, table_name, columns, constraints):
+        # mark schema loaded
+        cls.loaded = True
+        cls.generation += 1
+
+    def create_table(self, table_name, columns, constraints, indexes=[]):
         """
         called by the schema when loaded
         """
@@ -21,4 +33,19 @@ class ActiveRecordSchema():
         # fill db schema
         self.db_schema[table_name] = dict(
             columns=columns,
-            constraints=constraints)
+            constraints=constraints,
+            indexes=indexes)
+
+    @classmethod
+    def load(cls, tables):
+        """
+        called by the schema cache when loaded
+        """
+
+        # fill db schema
+        for table_name, content in tables.items():
+            cls.db_schema[table_name] = content
+
+        # mark schema loaded
+        cls.loaded = True
+        cls.generation += 1
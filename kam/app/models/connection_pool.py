@@ -0,0 +1,249 @@
+
+import time
+import threading
+
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_UNKNOWN)
+
+
+class ConnectionPool():
+    """
+    thread safe pool of database connections
+    connections are checked out by a thread and checked back in once released
+    """
+
+    def __init__(self, connect, min_size=1, max_size=5, checkout_timeout=5, max_idle=300):
+
+        # connection factory
+        self.connect = connect
+
+        # pool params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle = max_idle
+
+        # idle connections with their checkin time, most recent last
+        self.idle = []
+
+        # checked out connections with their owner thread
+        self.checked_out = {}
+
+        # slots reserved by threads opening a connection outside of the lock
+        self.connecting = 0
+
+        # statistics
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+
+        self.condition = threading.Condition()
+
+    def __size(self):
+
+        return len(self.idle) + len(self.checked_out) + self.connecting
+
+    def __close(self, conn):
+        """
+        close a connection leaving the pool
+        """
+
+        self.closed += 1
+
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def __connect(self):
+        """
+        open a connection for a slot reserved under the lock, releasing the slot if the connection fails
+        """
+
+        try:
+            return self.connect()
+
+        except Exception:
+
+            with self.condition:
+
+                self.connecting -= 1
+                self.condition.notify()
+
+            raise
+
+    def __reap(self):
+        """
+        check in connections of threads which ended without releasing them
+        """
+
+        for conn, thread in list(self.checked_out.items()):
+
+            if not thread.is_alive():
+
+                del self.checked_out[conn]
+                self.__close(conn)
+
+    def __recycle(self):
+        """
+        close connections idle for too long, keeping the minimum pool size
+        """
+
+        now = time.monotonic()
+
+        while (len(self.idle) > 0
+               and self.__size() > self.min_size
+               and now - self.idle[0][1] > self.max_idle):
+
+            conn, _ = self.idle.pop(0)
+            self.__close(conn)
+
+    def checkout(self):
+        """
+        check out a connection for the current thread, waiting for a connection to be released if the pool is full
+        """
+
+        deadline = time.monotonic() + self.checkout_timeout
+
+        with self.condition:
+
+            self.__recycle()
+
+            while True:
+
+                # reuse the most recently used idle connection
+                if len(self.idle) > 0:
+
+                    conn, _ = self.idle.pop()
+
+                    self.checked_out[conn] = threading.current_thread()
+                    self.checkouts += 1
+
+                    return conn
+
+                # reserve a slot for a new connection
+                if self.__size() < self.max_size:
+
+                    self.connecting += 1
+                    break
+
+                # release connections of ended threads
+                self.__reap()
+
+                if self.__size() < self.max_size:
+                    continue
+
+                # wait for a connection to be released
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+
+                    self.timeouts += 1
+                    raise TimeoutError(
+                        f"Could not check out a database connection within {self.checkout_timeout}s "
+                        + f"(pool size {self.max_size}) 🤒")
+
+                self.waiting += 1
+                self.condition.wait(remaining)
+                self.waiting -= 1
+
+        # open the connection without holding the lock
+        conn = self.__connect()
+
+        with self.condition:
+
+            self.connecting -= 1
+            self.created += 1
+
+            self.checked_out[conn] = threading.current_thread()
+            self.checkouts += 1
+
+        return conn
+
+    def checkin(self, conn):
+        """
+        return a connection to the pool
+        """
+
+        # end any transaction left open by the thread
+        status = conn.get_transaction_status() if not conn.closed else TRANSACTION_STATUS_UNKNOWN
+
+        if status not in [TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN]:
+
+            try:
+                conn.rollback()
+            except Exception:
+                status = TRANSACTION_STATUS_UNKNOWN
+
+        with self.condition:
+
+            self.checked_out.pop(conn, None)
+
+            # broken connections leave the pool
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                self.__close(conn)
+            else:
+                self.idle.append((conn, time.monotonic()))
+
+            self.condition.notify()
+
+    def fill(self):
+        """
+        open idle connections up to the minimum pool size
+        """
+
+        while True:
+
+            # reserve a slot
+            with self.condition:
+
+                if self.__size() >= self.min_size:
+                    return
+
+                self.connecting += 1
+
+            # open the connection without holding the lock
+            conn = self.__connect()
+
+            with self.condition:
+
+                self.connecting -= 1
+                self.created += 1
+
+                self.idle.append((conn, time.monotonic()))
+                self.condition.notify()
+
+    def close_all(self):
+        """
+        close idle connections
+        """
+
+        with self.condition:
+
+            for conn, _ in self.idle:
+                self.__close(conn)
+
+            self.idle = []
+
+    def stats(self):
+        """
+        return pool statistics
+        """
+
+        with self.condition:
+
+            return dict(
+                size=self.__size(),
+                idle=len(self.idle),
+                checked_out=len(self.checked_out),
+                connecting=self.connecting,
+                waiting=self.waiting,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                created=self.created,
+                closed=self.closed,
+                checkouts=self.checkouts,
+                timeouts=self.timeouts)
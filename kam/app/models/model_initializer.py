@@ -0,0 +1,115 @@
+
+import keyword
+
+
+def __is_attribute_name(name):
+    """
+    determines whether a column can be accessed as an attribute in the compiled code
+    """
+
+    return name.isidentifier() and not keyword.iskeyword(name)
+
+
+def __get(name):
+    """
+    return the expression reading an attribute of self (other names go through getattr)
+    """
+
+    if __is_attribute_name(name):
+        return f"self.{name}"
+
+    return f"getattr(self, {name!r})"
+
+
+def __set(name, value):
+    """
+    return the statement setting an attribute of self (other names go through setattr)
+    """
+
+    if __is_attribute_name(name):
+        return f"self.{name} = {value}"
+
+    return f"setattr(self, {name!r}, {value})"
+
+
+def build_initializer(table_definition):
+    """
+    compile the instance initializer of a table definition
+    the initializer sets the columns, the provided references and the change tracking state
+    of a record constructed by the user (a provided id is written on save)
+    """
+
+    # retrieve columns and references
+    columns = [c for c in table_definition["columns"].keys() if c != "timestamps"]
+    references = [c[:-3] for c in table_definition["constraints"].keys() if c[-3:] == "_id"]
+
+    # set columns from the constructor arguments
+    lines = [
+        "def initialize(self, kwargs):",
+        "    get = kwargs.get"]
+
+    lines += [f"    {__set(column, f'get({column!r})')}" for column in columns]
+
+    # set provided references along with their id
+    for reference in references:
+        lines += [
+            f"    if {reference!r} in kwargs:",
+            f"        {__set(reference, f'kwargs[{reference!r}]')}",
+            f"        {__set(f'{reference}_id', __get(reference) + '.id')}"]
+
+    # relations are only eager loaded on demand
+    lines += [
+        "    self.preloaded_relations = None",
+        "    self.previous_changes = {}"]
+
+    # track changes from no persisted values (loaded records are snapshot by their loader)
+    lines += [
+        "    self.original_attributes = dict.fromkeys(COLUMNS)"]
+
+    # compile initializer
+    namespace = dict(COLUMNS=tuple(columns))
+    exec("\n".join(lines), namespace)
+
+    return namespace["initialize"]
+
+
+def build_loader(klass, table_definition, columns):
+    """
+    compile the loader of the rows of a result set (tuples in the order of columns)
+    loaded records are created without calling __init__ and set like the initializer would
+    """
+
+    # retrieve model columns (unselected columns are None)
+    model_columns = [c for c in table_definition["columns"].keys() if c != "timestamps"]
+
+    # resolve the row index of each model column once per result set
+    indexes = {column: index for index, column in enumerate(columns) if column in model_columns}
+
+    lines = [
+        "def load(rows):",
+        "    records = []",
+        "    append = records.append",
+        "    for row in rows:",
+        "        self = new(klass)"]
+
+    lines += [f"        {__set(column, f'row[{indexes[column]}]' if column in indexes else 'None')}"
+              for column in model_columns]
+
+    # relations are only eager loaded on demand
+    lines += [
+        "        self.preloaded_relations = None",
+        "        self.previous_changes = {}"]
+
+    # track changes from the persisted values
+    persisted_values = ", ".join([f"{column!r}: {__get(column)}" for column in model_columns])
+
+    lines += [
+        f"        self.original_attributes = {{{persisted_values}}}",
+        "        append(self)",
+        "    return records"]
+
+    # compile loader
+    namespace = dict(klass=klass, new=klass.__new__)
+    exec("\n".join(lines), namespace)
+
+    return namespace["load"]
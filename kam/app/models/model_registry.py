@@ -0,0 +1,141 @@
+
+from kam.app.helpers.grammar import (
+    singularize,
+    pluralize,
+    is_plural)
+
+from kam.app.helpers.noun import (
+    table_ref_to_klass_name,
+    klass_name_to_table_ref)
+
+import importlib
+
+
+class ModelRegistry():
+    """
+    model klasses along with their table name, singular reference and schema
+    klasses are registered once when defined and names are inflected once
+    """
+
+    def __init__(self):
+
+        # models by klass
+        self.models = {}
+
+        # model klasses by singular reference
+        self.refs = {}
+
+        # inflections by table name or reference
+        self.names = {}
+
+    def register(self, klass):
+        """
+        register model klass names
+        """
+
+        # build names
+        table_ref = klass_name_to_table_ref(klass.__name__)
+        table_name = pluralize(table_ref)
+
+        # schema definition, initializer and row loaders are filled on first use (see ActiveRecord)
+        model = dict(
+            klass=klass,
+            table_name=table_name,
+            table_ref=table_ref,
+            definition=None,
+            schema_generation=None,
+            initializer=None,
+            initialized=False,
+            loaders={})
+
+        self.models[klass] = model
+        self.refs[table_ref] = klass
+
+        return model
+
+    def model(self, klass):
+        """
+        return model klass names, registering the klass if needed
+        """
+
+        model = self.models.get(klass)
+
+        if model is None:
+            model = self.register(klass)
+
+        return model
+
+    def inflect(self, name):
+        """
+        return singular reference, table name and plurality of a table name or reference
+        """
+
+        inflection = self.names.get(name)
+
+        if inflection is None:
+
+            plural = is_plural(name)
+            table_ref = singularize(name) if plural else name
+            table_name = name if plural else pluralize(name)
+
+            inflection = (table_ref, table_name, plural)
+            self.names[name] = inflection
+
+        return inflection
+
+    def table_ref(self, name):
+        """
+        return singular reference of a table name or reference
+        """
+
+        return self.inflect(name)[0]
+
+    def table_name(self, name):
+        """
+        return table name of a table name or reference
+        """
+
+        return self.inflect(name)[1]
+
+    def is_plural(self, name):
+        """
+        determines whether a table name or reference is plural
+        """
+
+        return self.inflect(name)[2]
+
+    def table_klass(self, name):
+        """
+        return registered model klass of a table name or reference, if any
+        """
+
+        return self.refs.get(self.table_ref(name))
+
+    def klass(self, name, module_name):
+        """
+        return model klass of a table name or reference
+        the model module is imported from the package of module_name on first use
+        """
+
+        # retrieve registered klass
+        table_ref = self.table_ref(name)
+        klass = self.refs.get(table_ref)
+
+        if klass is not None:
+            return klass
+
+        # build module name
+        klass_module_name = ".".join(module_name.split(".")[:-1] + [table_ref])
+
+        # import module (registers its model klass)
+        klass_module = importlib.import_module(klass_module_name)
+
+        # get klass
+        klass = getattr(klass_module, table_ref_to_klass_name(table_ref))
+        self.model(klass)
+
+        return klass
+
+
+# models of the application
+REGISTRY = ModelRegistry()
@@ -0,0 +1,152 @@
+
+from contextlib import contextmanager
+
+import time
+import logging
+import threading
+
+
+# queries run by the database
+SQL_EVENT = "sql.kam"
+
+# kam output is silent unless a handler is configured (see scripts/kam)
+logger = logging.getLogger("kam")
+logger.addHandler(logging.NullHandler())
+
+
+class Notifications():
+    """
+    subscribers of instrumentation events (the sql.kam event is published for each query)
+    """
+
+    def __init__(self):
+
+        # callbacks by event name
+        self.subscribers = {}
+
+        self.lock = threading.Lock()
+
+        # payload added to the events of the current thread
+        self.local = threading.local()
+
+    def subscribe(self, name, callback):
+        """
+        call callback(event) for each event published under name
+        """
+
+        with self.lock:
+
+            # copy on write, publishers iterate without locking
+            self.subscribers[name] = self.subscribers.get(name, []) + [callback]
+
+        return (name, callback)
+
+    def unsubscribe(self, subscriber):
+        """
+        stop notifying a subscriber
+        """
+
+        name, callback = subscriber
+
+        with self.lock:
+
+            callbacks = [c for c in self.subscribers.get(name, []) if c is not callback]
+
+            if len(callbacks) > 0:
+                self.subscribers[name] = callbacks
+            else:
+                self.subscribers.pop(name, None)
+
+    def subscribed(self, name):
+        """
+        determines whether an event has subscribers
+        """
+
+        return name in self.subscribers
+
+    def publish(self, name, event):
+        """
+        notify subscribers of an event
+        """
+
+        for callback in self.subscribers.get(name, []):
+            callback(event)
+
+    @contextmanager
+    def subscription(self, name, callback):
+        """
+        subscribe during the block
+        """
+
+        subscriber = self.subscribe(name, callback)
+
+        try:
+            yield subscriber
+        finally:
+            self.unsubscribe(subscriber)
+
+    @contextmanager
+    def context(self, **payload):
+        """
+        add payload to the events instrumented by the current thread during the block
+        """
+
+        previous = getattr(self.local, "payload", {})
+        self.local.payload = dict(previous, **payload)
+
+        try:
+            yield
+        finally:
+            self.local.payload = previous
+
+    @contextmanager
+    def instrument(self, name, payload, timed=False):
+        """
+        time the block and publish its event (payload, duration and exception if any)
+        the yielded event can be completed by the block (row count for instance)
+        blocks are only timed when the event has subscribers or when timed is set
+        """
+
+        event = dict(getattr(self.local, "payload", {}), **payload)
+        event["name"] = name
+
+        # nothing to time
+        if not timed and not self.subscribed(name):
+            yield event
+            return
+
+        start = time.perf_counter()
+
+        try:
+
+            yield event
+
+        except BaseException as e:
+
+            event["exception"] = e
+            raise
+
+        finally:
+
+            event["duration"] = time.perf_counter() - start
+            self.publish(name, event)
+
+
+# application notifications
+NOTIFICATIONS = Notifications()
+
+
+def subscribe(name, callback):
+    """
+    call callback(event) for each event published under name
+    """
+
+    return NOTIFICATIONS.subscribe(name, callback)
+
+
+def unsubscribe(subscriber):
+    """
+    stop notifying a subscriber
+    """
+
+    NOTIFICATIONS.unsubscribe(subscriber)
@@ -0,0 +1,96 @@
+
+from collections import OrderedDict
+
+
+class PreparedStatementCache():
+    """
+    least recently used cache of the server side prepared statements of a connection
+    """
+
+    def __init__(self, max_size=100):
+
+        # prepared statement names by key
+        self.statements = OrderedDict()
+        self.max_size = max_size
+
+        # statement names counter
+        self.counter = 0
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __prepare(self, cur, key, query):
+        """
+        prepare statement, evicting the least recently used one if needed
+        """
+
+        # build statement name
+        self.counter += 1
+        name = f"kam_statement_{self.counter}"
+
+        # replace psycopg2 placeholders by positional parameters
+        parts = query.rstrip(";").split("%s")
+        prepared_query = parts[0] + "".join([f"${index + 1}{part}" for index, part in enumerate(parts[1:])])
+
+        cur.execute(f"PREPARE {name} AS {prepared_query};")
+
+        self.statements[key] = name
+
+        # evict least recently used statement
+        if len(self.statements) > self.max_size:
+
+            _, evicted_name = self.statements.popitem(last=False)
+            cur.execute(f"DEALLOCATE {evicted_name};")
+
+            self.evictions += 1
+
+        return name
+
+    def execute(self, cur, key, query, query_params=[]):
+        """
+        execute query through the prepared statement of its key
+        """
+
+        name = self.statements.get(key)
+
+        if name is None:
+
+            self.misses += 1
+            name = self.__prepare(cur, key, query)
+
+        else:
+
+            self.hits += 1
+            self.statements.move_to_end(key)
+
+        # execute statement
+        execute_query = f"EXECUTE {name}"
+
+        if len(query_params) > 0:
+            execute_query += " (" + ", ".join(["%s"] * len(query_params)) + ")"
+
+        cur.execute(execute_query + ";", query_params)
+
+    def clear(self, cur):
+        """
+        deallocate all statements (prepared plans are invalidated by schema changes)
+        """
+
+        if len(self.statements) > 0:
+            cur.execute("DEALLOCATE ALL;")
+
+        self.statements.clear()
+
+    def stats(self):
+        """
+        return cache statistics
+        """
+
+        return dict(
+            size=len(self.statements),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions)
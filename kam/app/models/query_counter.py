@@ -0,0 +1,128 @@
+
+from kam.app.models.notifications import (
+    NOTIFICATIONS,
+    SQL_EVENT)
+
+from kam.app.models.slow_query_log import caller_frame
+
+from contextlib import contextmanager
+
+import sys
+import warnings
+import threading
+
+
+class NPlusOneWarning(UserWarning):
+    """
+    identical queries repeated from the same call site (relation queried for each record of a loop)
+    """
+
+
+class QueryCounter():
+    """
+    collects the queries run by the current thread
+    """
+
+    def __init__(self):
+
+        # queries of other threads are ignored
+        self.thread = threading.get_ident()
+
+        self.queries = []
+
+    def __call__(self, event):
+
+        if threading.get_ident() == self.thread:
+            self.queries.append(event)
+
+    def __len__(self):
+
+        return len(self.queries)
+
+
+class NPlusOneDetector():
+    """
+    warns about identical queries repeated from the same call site by the current thread
+    queries of belongs_to and has_many relations suggest eager loading the relation
+    """
+
+    def __init__(self, threshold=2):
+
+        # repetitions from which queries are reported
+        self.threshold = threshold
+
+        # queries of other threads are ignored
+        self.thread = threading.get_ident()
+
+        # repetitions by query and call site
+        self.repetitions = {}
+
+    def __call__(self, event):
+
+        if threading.get_ident() != self.thread:
+            return
+
+        # retrieve call site
+        _, frame = caller_frame(sys._getframe())
+
+        if frame is None:
+            return
+
+        file_name = frame.f_code.co_filename
+        line = frame.f_lineno
+
+        # count repetitions of the query shape (values are bound parameters)
+        key = (event["sql"], file_name, line)
+        count = self.repetitions.get(key, 0) + 1
+        self.repetitions[key] = count
+
+        # report once
+        if count != self.threshold:
+            return
+
+        warnings.warn_explicit(self.message(event), NPlusOneWarning, file_name, line)
+
+    def message(self, event):
+        """
+        describe a repeated query
+        """
+
+        association = event.get("association")
+
+        if association is None:
+            return f"N+1 query: {event['table_name']} queried {self.threshold} times from the same line 🤒"
+
+        owner = event["owner"]
+
+        return (f"N+1 query: {owner}.{association} queried {self.threshold} times from the same line, "
+                + f"eager load it with {owner}.includes(\"{association}\") 🤒")
+
+
+@contextmanager
+def assert_queries(max):
+    """
+    fail when the block runs more than max queries
+    """
+
+    counter = QueryCounter()
+
+    with NOTIFICATIONS.subscription(SQL_EVENT, counter):
+        yield counter
+
+    if len(counter) > max:
+
+        queries = "\n".join([event["sql"] for event in counter.queries])
+
+        raise AssertionError(f"Expected at most {max} queries, ran {len(counter)} 🤒\n{queries}")
+
+
+@contextmanager
+def detect_n_plus_one(threshold=2):
+    """
+    warn about identical queries repeated from the same call site during the block
+    """
+
+    detector = NPlusOneDetector(threshold=threshold)
+
+    with NOTIFICATIONS.subscription(SQL_EVENT, detector):
+        yield detector
@@ -0,0 +1,654 @@
+
+from kam.app.models.model_registry import REGISTRY
+from kam.app.models.notifications import NOTIFICATIONS
+
+from kam.app.helpers.columns import (
+    rows_to_columns,
+    columns_to_dataframe)
+
+from contextlib import nullcontext
+
+
+ORDER_DIRECTIONS = ["asc", "desc"]
+
+
+class Relation():
+    """
+    lazy chainable query over the rows of a model
+    the query is only run once the relation is iterated, sliced, counted or indexed
+    """
+
+    def __init__(self, klass, model_klass=None, through=[], conditions={}):
+
+        # source model klass and filters
+        self.klass = klass
+        self.through = through
+        self.conditions = conditions
+
+        # target model klass (differs from the source klass when going through relations)
+        self.model_klass = klass if model_klass is None else model_klass
+
+        # query modifiers applied to the target rows
+        self.target_conditions = {}
+        self.select_columns = None
+        self.group_columns = []
+        self.order_clauses = []
+        self.limit_value = None
+        self.offset_value = None
+
+        # relations eager loaded along with the records
+        self.include_names = []
+
+        # record assigned to the loaded records (relation owner)
+        self.owner_name = None
+        self.owner = None
+
+        # belongs_to or has_many relation of the owner queried by the relation
+        self.association_name = None
+
+        # loaded records
+        self.records = None
+
+    def __spawn(self):
+        """
+        return an unloaded copy of the relation
+        """
+
+        # copy relation
+        relation = Relation(
+            self.klass,
+            model_klass=self.model_klass,
+            through=self.through,
+            conditions=self.conditions)
+
+        # copy query modifiers
+        relation.target_conditions = dict(self.target_conditions)
+        relation.select_columns = self.select_columns
+        relation.group_columns = list(self.group_columns)
+        relation.order_clauses = list(self.order_clauses)
+        relation.limit_value = self.limit_value
+        relation.offset_value = self.offset_value
+        relation.include_names = list(self.include_names)
+        relation.owner_name = self.owner_name
+        relation.owner = self.owner
+        relation.association_name = self.association_name
+
+        return relation
+
+    def where(self, **kwargs):
+        """
+        return relation filtered on the target rows
+        """
+
+        relation = self.__spawn()
+        relation.target_conditions.update(kwargs)
+
+        return relation
+
+    def select(self, *columns):
+        """
+        return relation retrieving only the columns of the target rows
+        the records are partial models, the other columns being None (their id is always retrieved)
+        """
+
+        relation = self.__spawn()
+        relation.select_columns = (self.select_columns or []) + list(columns)
+
+        return relation
+
+    def group(self, *columns):
+        """
+        return relation computing aggregates by groups of column values
+        """
+
+        relation = self.__spawn()
+        relation.group_columns += columns
+
+        return relation
+
+    def order(self, *columns, **directions):
+        """
+        return relation ordered by columns (ascending) or by column directions
+        """
+
+        relation = self.__spawn()
+
+        # ascending columns
+        for column in columns:
+            relation.order_clauses.append((column, "asc"))
+
+        # explicit directions
+        for column, direction in directions.items():
+
+            # validate direction
+            if direction.lower() not in ORDER_DIRECTIONS:
+                raise ValueError(f"Invalid order direction {direction}, supported: {', '.join(ORDER_DIRECTIONS)} 🤒")
+
+            relation.order_clauses.append((column, direction.lower()))
+
+        return relation
+
+    def limit(self, limit):
+        """
+        return relation limited to a number of rows
+        """
+
+        relation = self.__spawn()
+        relation.limit_value = limit
+
+        return relation
+
+    def offset(self, offset):
+        """
+        return relation skipping a number of rows
+        """
+
+        relation = self.__spawn()
+        relation.offset_value = offset
+
+        return relation
+
+    def includes(self, *names):
+        """
+        return relation eager loading relations of the records
+        nested relations are separated by dots ("skills.credits")
+        """
+
+        relation = self.__spawn()
+        relation.include_names += names
+
+        return relation
+
+    def owned_by(self, name, owner, association=None):
+        """
+        return relation assigning its owner to the loaded records
+        association names the relation of the owner queried by the relation
+        """
+
+        relation = self.__spawn()
+        relation.owner_name = name
+        relation.owner = owner
+        relation.association_name = association
+
+        return relation
+
+    def all(self):
+        """
+        return an unloaded copy of the relation
+        """
+
+        return self.__spawn()
+
+    def __select_params(self, limit, offset):
+        """
+        build select parameters of the relation
+        """
+
+        return dict(
+            through=self.through,
+            target_schema=self.model_klass.table_schema(),
+            target_conditions=self.target_conditions,
+            columns=self.select_columns,
+            order=self.order_clauses,
+            limit=limit,
+            offset=offset,
+            **self.conditions)
+
+    def __record_params(self, limit, offset):
+        """
+        build select parameters of the relation records, retrieving their id to save them as updates
+        """
+
+        select_params = self.__select_params(limit, offset)
+
+        if self.select_columns is not None and "id" not in self.select_columns:
+            select_params["columns"] = ["id"] + self.select_columns
+
+        return select_params
+
+    def __instantiate(self, columns, rows):
+        """
+        convert rows (tuples in the order of columns) to model instances
+        """
+
+        records = self.model_klass.instantiate(columns, rows)
+
+        # fill owner reference
+        if self.owner_name is not None:
+            for record in records:
+                self.__set_reference(record, self.owner_name, self.owner)
+
+        # eager load relations
+        if len(self.include_names) > 0:
+            self.__preload(records, self.include_names)
+
+        return records
+
+    def __set_reference(self, record, name, value):
+        """
+        assign a reference to a record (compact models only accept the references in their __slots__)
+        """
+
+        if hasattr(record, "__dict__") or hasattr(type(record), name):
+            setattr(record, name, value)
+
+    def __preload(self, records, names):
+        """
+        eager load relations of the records, one query per relation level
+        """
+
+        # build relations tree
+        tree = {}
+
+        for name in names:
+
+            node = tree
+            for part in name.split("."):
+                node = node.setdefault(part, {})
+
+        self.__preload_tree(records, tree)
+
+    def __preload_tree(self, records, tree):
+        """
+        eager load a level of relations and recurse on the loaded records
+        """
+
+        for name, subtree in tree.items():
+
+            # load relation
+            relation_records = self.__preload_relation(records, name)
+
+            # load nested relations
+            if len(subtree) > 0 and len(relation_records) > 0:
+                self.__preload_tree(relation_records, subtree)
+
+    def __preload_relation(self, records, name):
+        """
+        load a relation of all the records in a single query and stitch the loaded records
+        """
+
+        # nothing to load
+        if len(records) == 0:
+            return []
+
+        # retrieve relation declared by the owner klass
+        owner_klass = type(records[0])
+        klass_name = owner_klass.__name__
+        klass_ones = owner_klass.one.get(klass_name, {})
+        klass_manys = owner_klass.many.get(klass_name, {})
+
+        if name in klass_ones.keys():
+            relation_model = klass_ones[name]
+        elif name in klass_manys.keys():
+            relation_model = klass_manys[name]
+        else:
+            raise ValueError(f"Missing relation {name} for {klass_name} 🤒")
+
+        relation_klass = relation_model["klass"]
+        relation_through = relation_model["through"]
+
+        if relation_through is None:
+            relation_through = [name]
+
+        # retrieve the relation rows of all the owners
+        owner_ids = list({record.id for record in records if record.id is not None})
+
+        columns, relation_rows = owner_klass.db.select_tuples_where(
+            owner_klass.table_name(),
+            owner_klass.table_schema(),
+            through=relation_through,
+            owner_key=True,
+            id=owner_ids)
+
+        owner_index = columns.index("kam_owner_id")
+        id_index = columns.index("id")
+
+        # convert rows to model instances, sharing instances between owners
+        unique_rows = {}
+
+        for row in relation_rows:
+            unique_rows.setdefault(row[id_index], row)
+
+        loaded_records = dict(zip(unique_rows.keys(), relation_klass.instantiate(columns, list(unique_rows.values()))))
+        owner_records = {}
+
+        for row in relation_rows:
+            owner_records.setdefault(row[owner_index], []).append(loaded_records[row[id_index]])
+
+        # build owner reference
+        owner_ref = REGISTRY.model(owner_klass)["table_ref"]
+
+        # stitch the loaded records onto their owners
+        for record in records:
+
+            relation = Relation(
+                owner_klass,
+                model_klass=relation_klass,
+                through=relation_through,
+                conditions=dict(id=record.id))
+            relation.records = owner_records.get(record.id, [])
+
+            # fill owner reference of has many relations
+            if name in klass_manys.keys():
+
+                relation.owner_name = owner_ref
+                relation.owner = record
+
+                for relation_record in relation.records:
+                    self.__set_reference(relation_record, owner_ref, record)
+
+            if record.preloaded_relations is None:
+                record.preloaded_relations = {}
+
+            record.preloaded_relations[name] = relation
+
+        return list(loaded_records.values())
+
+    def __instrumentation(self):
+        """
+        describe the association queried by the relation to the query events (n+1 detection)
+        """
+
+        if self.association_name is None:
+            return nullcontext()
+
+        return NOTIFICATIONS.context(
+            association=self.association_name,
+            owner=type(self.owner).__name__)
+
+    def __query(self, limit, offset):
+        """
+        run the relation query and convert rows to model instances
+        """
+
+        # retrieve rows
+        with self.__instrumentation():
+            columns, matching_rows = self.klass.db.select_tuples_where(
+                self.klass.table_name(),
+                self.klass.table_schema(),
+                **self.__record_params(limit, offset))
+
+        return self.__instantiate(columns, matching_rows)
+
+    def pluck(self, *columns):
+        """
+        return the column values of the target rows as tuples, without instantiating models
+        a single column returns a list of values
+        """
+
+        # loaded relations are served from the cache
+        if self.records is not None:
+            rows = [tuple([getattr(record, column) for column in columns]) for record in self.records]
+
+        else:
+
+            # retrieve tuples
+            select_params = self.__select_params(self.limit_value, self.offset_value)
+            select_params["columns"] = list(columns)
+
+            with self.__instrumentation():
+                rows = self.klass.db.pluck_where(
+                    self.klass.table_name(),
+                    self.klass.table_schema(),
+                    **select_params)
+
+        if len(columns) == 1:
+            return [row[0] for row in rows]
+
+        return [tuple(row) for row in rows]
+
+    def __aggregate(self, function, column=None):
+        """
+        compute an aggregate of the target rows in the database
+        grouped relations return the aggregates by group values
+        """
+
+        # compute aggregate
+        with self.__instrumentation():
+            result = self.klass.db.aggregate_where(
+                self.klass.table_name(),
+                self.klass.table_schema(),
+                (function, column),
+                group=self.group_columns,
+                **self.__select_params(self.limit_value, self.offset_value))
+
+        if len(self.group_columns) == 0:
+            return result
+
+        # index aggregates by group values
+        if len(self.group_columns) == 1:
+            return {row[0]: row[1] for row in result}
+
+        return {tuple(row[:-1]): row[-1] for row in result}
+
+    def count(self, column=None):
+        """
+        return the number of target rows (with a value for column if provided)
+        """
+
+        # loaded relations are served from the cache
+        if self.records is not None and column is None and len(self.group_columns) == 0:
+            return len(self.records)
+
+        return self.__aggregate("count", column)
+
+    def exists(self):
+        """
+        determines whether the relation has target rows, retrieving at most one
+        """
+
+        # loaded relations are served from the cache
+        if self.records is not None:
+            return len(self.records) > 0
+
+        # restrict query to a single row
+        limit = 1 if self.limit_value is None else min(self.limit_value, 1)
+
+        if limit == 0:
+            return False
+
+        select_params = self.__select_params(limit, self.offset_value)
+        select_params["columns"] = ["id"]
+
+        with self.__instrumentation():
+            rows = self.klass.db.pluck_where(
+                self.klass.table_name(),
+                self.klass.table_schema(),
+                **select_params)
+
+        return len(rows) > 0
+
+    def sum(self, column):
+        """
+        return the sum of a column of the target rows
+        """
+
+        total = self.__aggregate("sum", column)
+
+        # sum of no rows
+        if total is None:
+            return 0
+
+        return total
+
+    def average(self, column):
+        """
+        return the average of a column of the target rows
+        """
+
+        return self.__aggregate("average", column)
+
+    def minimum(self, column):
+        """
+        return the minimum of a column of the target rows
+        """
+
+        return self.__aggregate("minimum", column)
+
+    def maximum(self, column):
+        """
+        return the maximum of a column of the target rows
+        """
+
+        return self.__aggregate("maximum", column)
+
+    def find_in_batches(self, batch_size=1000):
+        """
+        yield lists of model instances streamed from a server side cursor
+        memory is bounded by the batch size and the relation is not loaded
+        """
+
+        # stream rows
+        batches = self.klass.db.select_in_batches(
+            self.klass.table_name(),
+            self.klass.table_schema(),
+            batch_size=batch_size,
+            **self.__record_params(self.limit_value, self.offset_value))
+
+        for columns, batch_rows in batches:
+            yield self.__instantiate(columns, batch_rows)
+
+    def find_each(self, batch_size=1000):
+        """
+        yield model instances streamed from a server side cursor
+        """
+
+        for records in self.find_in_batches(batch_size=batch_size):
+            yield from records
+
+    def __column_types(self):
+        """
+        return the kam data types of the selected target columns
+        """
+
+        target_schema = self.model_klass.table_schema()
+        columns = self.select_columns or [c for c in target_schema.keys() if c != "timestamps"]
+
+        return {column: target_schema.get(column) for column in columns}
+
+    def to_columns(self, batch_size=10000):
+        """
+        return the target columns as numpy masked arrays (nulls are masked)
+        rows are streamed in batches as tuples, without instantiating models
+        """
+
+        column_types = self.__column_types()
+        columns = list(column_types.keys())
+
+        # loaded relations are served from the cache
+        if self.records is not None:
+
+            batches = [(columns, [tuple([getattr(record, column) for column in columns]) for record in self.records])]
+
+        else:
+
+            # stream tuples
+            select_params = self.__select_params(self.limit_value, self.offset_value)
+            select_params["columns"] = columns
+
+            batches = self.klass.db.select_in_batches(
+                self.klass.table_name(),
+                self.klass.table_schema(),
+                batch_size=batch_size,
+                **select_params)
+
+        return rows_to_columns((batch_rows for _, batch_rows in batches), columns, column_types)
+
+    def to_dataframe(self, batch_size=10000):
+        """
+        return the target columns as a pandas data frame
+        """
+
+        return columns_to_dataframe(self.to_columns(batch_size=batch_size), self.__column_types())
+
+    def copy_to(self, file, file_format="csv"):
+        """
+        stream the relation rows into a csv or tsv file without loading them
+        """
+
+        self.klass.db.copy_where(
+            self.klass.table_name(),
+            self.klass.table_schema(),
+            file,
+            file_format=file_format,
+            **self.__select_params(self.limit_value, self.offset_value))
+
+    def load(self):
+        """
+        run the query once and cache the records
+        """
+
+        if self.records is None:
+            self.records = self.__query(self.limit_value, self.offset_value)
+
+        return self
+
+    def to_list(self):
+        """
+        return loaded records
+        """
+
+        return list(self.load().records)
+
+    def __slice(self, start, stop):
+        """
+        query a window of the relation without loading it
+        """
+
+        # process window relative to the current offset and limit
+        base_offset = self.offset_value or 0
+        offset = base_offset + start
+        limit = None if stop is None else max(stop - start, 0)
+
+        if self.limit_value is not None:
+            remaining = max(self.limit_value - start, 0)
+            limit = remaining if limit is None else min(limit, remaining)
+
+        # nothing to retrieve
+        if limit == 0:
+            return []
+
+        return self.__query(limit, offset if offset > 0 else None)
+
+    def __getitem__(self, key):
+
+        # loaded relations are served from the cache
+        if self.records is not None:
+            return self.records[key]
+
+        if isinstance(key, slice):
+
+            # negative bounds and steps require the full result
+            if (key.step not in (None, 1)
+                    or (key.start or 0) < 0
+                    or (key.stop is not None and key.stop < 0)):
+                return self.to_list()[key]
+
+            return self.__slice(key.start or 0, key.stop)
+
+        # negative indexes require the full result
+        if key < 0:
+            return self.to_list()[key]
+
+        records = self.__slice(key, key + 1)
+
+        if len(records) == 0:
+            raise IndexError("relation index out of range")
+
+        return records[0]
+
+    def __iter__(self):
+
+        return iter(self.load().records)
+
+    def __len__(self):
+
+        return len(self.load().records)
+
+    def __bool__(self):
+
+        return len(self) > 0
+
+    def __repr__(self):
+
+        return f"#<Relation {self.model_klass.__name__} {self.load().records}>"
@@ -0,0 +1,139 @@
+
+from logging.handlers import RotatingFileHandler
+
+import os
+import sys
+import json
+import logging
+import datetime
+import contextlib
+
+import kam
+
+
+# directory of kam frames (skipped to find the call site)
+KAM_DIRECTORY = os.path.dirname(os.path.abspath(kam.__file__))
+
+# reads whose statement can run again through explain analyze
+ANALYZE_OPERATIONS = [
+    "select",
+    "select_in_batches",
+    "pluck",
+    "aggregate"]
+
+# operations whose statement can be explained (writes are planned without running again)
+EXPLAIN_OPERATIONS = ANALYZE_OPERATIONS + [
+    "insert",
+    "update",
+    "destroy_all"]
+
+
+def caller_frame(frame):
+    """
+    return the kam method originating a query and the frame of its caller
+    frames are walked from the query up to the first frame outside of kam
+    """
+
+    method = None
+
+    while frame is not None:
+
+        code = frame.f_code
+
+        if os.path.abspath(code.co_filename).startswith(KAM_DIRECTORY):
+
+            # outermost kam frame so far
+            method = getattr(code, "co_qualname", code.co_name)
+
+        elif method is not None and code.co_filename != contextlib.__file__:
+
+            # caller of the outermost kam frame (context managers run within kam)
+            return method, frame
+
+        frame = frame.f_back
+
+    return method, None
+
+
+def call_site(frame):
+    """
+    return the kam method originating a query and its python call site
+    """
+
+    method, frame = caller_frame(frame)
+
+    if frame is None:
+        return method, None
+
+    return method, f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+class SlowQueryLog():
+    """
+    records statements running longer than a threshold to a rotating log file
+    each record is a json line (sql, params, duration, kam method, call site and plan)
+    """
+
+    def __init__(self, path, threshold=100, explain=False, max_bytes=10 * 1024 * 1024, backup_count=5):
+
+        # threshold in milliseconds
+        self.threshold = threshold
+        self.explain = explain
+        self.path = path
+
+        # one logger per log file, handlers are shared by databases
+        self.logger = logging.getLogger(f"kam.slow_queries.{os.path.abspath(path)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.WARNING)
+
+        if len(self.logger.handlers) == 0:
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def is_slow(self, event):
+        """
+        determines whether a query ran longer than the threshold
+        """
+
+        return event["duration"] * 1000 >= self.threshold
+
+    def is_explainable(self, event):
+        """
+        determines whether a slow query is run again through explain
+        """
+
+        return self.explain and "exception" not in event and event["operation"] in EXPLAIN_OPERATIONS
+
+    def is_analyzable(self, event):
+        """
+        determines whether an explained query runs again to measure its plan (reads only)
+        """
+
+        return event["operation"] in ANALYZE_OPERATIONS
+
+    def record(self, event, plan=None):
+        """
+        write a slow query record
+        """
+
+        method, site = call_site(sys._getframe())
+
+        record = dict(
+            time=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            duration=round(event["duration"] * 1000, 3),
+            sql=event["sql"],
+            params=event["params"],
+            operation=event["operation"],
+            table_name=event["table_name"],
+            model=event["model"],
+            method=method,
+            call_site=site,
+            row_count=event.get("row_count"),
+            plan=plan)
+
+        # bound values of any type are written as text
+        self.logger.warning(json.dumps(record, default=str))
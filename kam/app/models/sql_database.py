@@ -1,29 +1,65 @@
 
 from kam.app.models.base_database import BaseDatabase
+from kam.app.models.prepared_statement_cache import PreparedStatementCache
+from kam.app.models.connection_pool import ConnectionPool
+from kam.app.models.model_registry import REGISTRY
+from kam.app.models.slow_query_log import SlowQueryLog
+from kam.app.models.query_counter import detect_n_plus_one
+from kam.app.models.notifications import (
+    NOTIFICATIONS,
+    SQL_EVENT,
+    logger)
 
 from kam.app.controllers.model_controller import SUPPORTED_DATA_TYPES
 
 from kam.app.helpers.grammar import (
-    singularize,
-    pluralize,
-    is_plural)
+    pluralize)
 
 from kam.app.helpers.database import (
-    retrieve_table_alias)
+    retrieve_table_alias,
+    where_condition)
+
+from kam.app.models.active_record_schema import SCHEMA_CACHE_VERSION
 
 from kam.app.helpers.file import (
-    schema_file_path)
+    schema_file_path,
+    schema_cache_file_path,
+    log_file_path)
 
 import os
+import csv
+import json
 import uuid
+import weakref
+import threading
+
+from contextlib import contextmanager
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values, execute_batch
 
 from jinja2 import Environment, PackageLoader, select_autoescape
 
 TEMPLATE_SCHEMA_FILENAME = "schema.py"
 
+COPY_DELIMITERS = dict(
+    csv=",",
+    tsv="\t")
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+ON_DELETE_ACTIONS = dict(
+    cascade="CASCADE",
+    nullify="SET NULL",
+    restrict="RESTRICT")
+
+AGGREGATE_FUNCTIONS = dict(
+    count="COUNT",
+    sum="SUM",
+    average="AVG",
+    minimum="MIN",
+    maximum="MAX")
+
 DB_TO_KAM_DATATYPE = dict(
                 varchar="string",
                 text="string",
@@ -50,25 +86,369 @@ class SqlDatabase(BaseDatabase):
         self.user = self.connection_params.get("user")
         self.password = self.connection_params.get("password")
 
+        # thread bound state (connection checked out from the pool, transactions)
+        self.local = threading.local()
+
+        # connection pool
+        self.pool = None
+        pool_params = params.get("pool")
+
         # create database connection
-        if not no_schema:
+        if not no_schema and pool_params is not None:
 
-            # connect to schema
-            self.conn = psycopg2.connect(**self.connection_params)
+            # each thread checks out its own connection
+            self.pool = ConnectionPool(
+                lambda: psycopg2.connect(**self.connection_params),
+                min_size=pool_params.get("min_size", 1),
+                max_size=pool_params.get("max_size", 5),
+                checkout_timeout=pool_params.get("checkout_timeout", 5),
+                max_idle=pool_params.get("max_idle", 300))
 
-        else:
+        # single connection, opened on first use
+        self.no_schema = no_schema
+        self.single_conn = None
+
+        # prepared statements, cached per connection
+        self.prepared_statements = params.get("prepared_statements", True)
+        self.statement_limit = params.get("statement_limit", 100)
+        self.statement_caches = weakref.WeakKeyDictionary()
+
+        # slow queries log
+        self.slow_query_log = None
+        slow_query_log_params = params.get("slow_query_log")
+
+        if slow_query_log_params is not None:
 
-            # connect without specifying the database schema (create and drop db)
-            self.conn = psycopg2.connect(
-                host=self.host,
-                port=self.port,
-                dbname="postgres",
-                user=self.user,
-                password=self.password)
+            self.slow_query_log = SlowQueryLog(
+                slow_query_log_params.get("path") or log_file_path("slow_queries.log"),
+                threshold=slow_query_log_params.get("threshold", 100),
+                explain=slow_query_log_params.get("explain", False),
+                max_bytes=slow_query_log_params.get("max_bytes", 10 * 1024 * 1024),
+                backup_count=slow_query_log_params.get("backup_count", 5))
+
+        # development mode, warns about n+1 queries during connection blocks
+        self.detect_n_plus_one = params.get("detect_n_plus_one", False)
 
         # call base init
         super().__init__(params)
 
+    def __connect(self):
+        """
+        open a single database connection
+        """
+
+        # connect to schema
+        if not self.no_schema:
+            return psycopg2.connect(**self.connection_params)
+
+        # connect without specifying the database schema (create and drop db)
+        return psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            dbname="postgres",
+            user=self.user,
+            password=self.password)
+
+    def __connect_single(self):
+        """
+        return the single connection, opened on first use
+        """
+
+        if self.single_conn is None:
+            self.single_conn = self.__connect()
+
+        return self.single_conn
+
+    def establish_connection(self):
+        """
+        connect ahead of the first query (fills the pool up to its minimum size)
+        """
+
+        if self.pool is None:
+            self.__connect_single()
+        else:
+            self.pool.fill()
+
+    @property
+    def conn(self):
+        """
+        return the connection of the current thread, checked out from the pool on first use
+        """
+
+        # single connection
+        if self.pool is None:
+
+            return self.__connect_single()
+
+        # thread connection
+        conn = getattr(self.local, "conn", None)
+
+        if conn is None:
+            conn = self.pool.checkout()
+            self.local.conn = conn
+
+        return conn
+
+    def release_connection(self):
+        """
+        return the connection of the current thread to the pool
+        """
+
+        # single connection or no connection checked out
+        if self.pool is None or getattr(self.local, "conn", None) is None:
+            return
+
+        if self.transaction_depth > 0:
+            raise ValueError("Cannot release a connection within a transaction 🤒")
+
+        self.pool.checkin(self.local.conn)
+        self.local.conn = None
+
+    @contextmanager
+    def connection(self):
+        """
+        check out a connection for the current thread during the block
+        in development mode (detect_n_plus_one) n+1 queries of the block are reported
+        """
+
+        # connection already held by the thread
+        held = self.pool is None or getattr(self.local, "conn", None) is not None
+
+        # detect n+1 queries in the outermost block
+        detecting = self.detect_n_plus_one and not getattr(self.local, "detecting", False)
+
+        try:
+
+            if detecting:
+
+                self.local.detecting = True
+
+                with detect_n_plus_one():
+                    yield self.conn
+
+            else:
+
+                yield self.conn
+
+        finally:
+
+            if detecting:
+                self.local.detecting = False
+
+            if not held:
+                self.release_connection()
+
+    def pool_stats(self):
+        """
+        return connection pool statistics
+        """
+
+        return None if self.pool is None else self.pool.stats()
+
+    @property
+    def transaction_depth(self):
+        """
+        return the transactions nesting level of the current thread
+        """
+
+        return getattr(self.local, "transaction_depth", 0)
+
+    @transaction_depth.setter
+    def transaction_depth(self, depth):
+
+        self.local.transaction_depth = depth
+
+    @property
+    def statement_cache(self):
+        """
+        return the prepared statements cache of the current connection
+        """
+
+        conn = self.conn
+        statement_cache = self.statement_caches.get(conn)
+
+        if statement_cache is None:
+            statement_cache = PreparedStatementCache(max_size=self.statement_limit)
+            self.statement_caches[conn] = statement_cache
+
+        return statement_cache
+
+    @contextmanager
+    def __instrument(self, cur, operation, table_name, query, query_params=None):
+        """
+        log query and publish its sql.kam event (sql, params, duration, row count and model)
+        the yielded event is None without subscribers nor slow queries log
+        """
+
+        logger.debug(query)
+
+        # nothing to publish nor log
+        if self.slow_query_log is None and not NOTIFICATIONS.subscribed(SQL_EVENT):
+            yield None
+            return
+
+        # retrieve model of the queried table
+        model_klass = None if table_name is None else REGISTRY.table_klass(table_name)
+
+        payload = dict(
+            sql=query,
+            params=query_params,
+            operation=operation,
+            table_name=table_name,
+            model=None if model_klass is None else model_klass.__name__)
+
+        with NOTIFICATIONS.instrument(SQL_EVENT, payload, timed=self.slow_query_log is not None) as event:
+
+            yield event
+
+            if "row_count" not in event:
+                event["row_count"] = cur.rowcount
+
+        # log slow query
+        if self.slow_query_log is not None and self.slow_query_log.is_slow(event):
+
+            plan = None
+
+            if self.slow_query_log.is_explainable(event):
+                plan = self.__explain(query, query_params, analyze=self.slow_query_log.is_analyzable(event))
+
+            self.slow_query_log.record(event, plan=plan)
+
+    def __explain(self, query, query_params, analyze=True):
+        """
+        return the plan of a query, run again through explain analyze for reads
+        the query runs in a savepoint rolled back afterwards, leaving no changes
+        """
+
+        cur = self.conn.cursor()
+
+        # queries run in a transaction (autocommit is disabled)
+        cur.execute("SAVEPOINT kam_explain;")
+
+        try:
+
+            # writes are only planned (running them again would fire triggers and advance sequences)
+            explain = "EXPLAIN (ANALYZE, BUFFERS)" if analyze else "EXPLAIN"
+
+            cur.execute(f"{explain} {query}", query_params)
+            plan = "\n".join([row[0] for row in cur.fetchall()])
+
+        except psycopg2.Error as e:
+
+            plan = f"explain failed: {e}".strip()
+
+        finally:
+
+            cur.execute("ROLLBACK TO SAVEPOINT kam_explain;")
+            cur.execute("RELEASE SAVEPOINT kam_explain;")
+
+        return plan
+
+    def __execute_prepared(self, cur, operation, table_name, query, query_params):
+        """
+        execute query through a cached server side prepared statement
+        statements are keyed by operation, table and query text, which derives
+        from the column set and through path while values are bound parameters
+        """
+
+        # prepared statements disabled
+        if not self.prepared_statements:
+            cur.execute(query, query_params)
+            return
+
+        try:
+
+            self.statement_cache.execute(cur, (operation, table_name, query), query, query_params)
+
+        except psycopg2.errors.FeatureNotSupported:
+
+            # cached plans cannot change result type after a schema change,
+            # statements can be prepared again unless a transaction is running
+            if self.transaction_depth > 0:
+                raise
+
+            self.conn.rollback()
+            self.clear_statement_cache()
+
+            self.statement_cache.execute(cur, (operation, table_name, query), query, query_params)
+
+    def clear_statement_cache(self):
+        """
+        deallocate prepared statements
+        """
+
+        self.statement_cache.clear(self.conn.cursor())
+
+    def statement_cache_stats(self):
+        """
+        return prepared statements cache statistics
+        """
+
+        return self.statement_cache.stats()
+
+    def __commit(self):
+        """
+        commit unless a transaction is running, in which case it commits once at its end
+        """
+
+        if self.transaction_depth == 0:
+            self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        run statements in a single transaction committed at the end
+        nested transactions use savepoints
+        """
+
+        # nested transaction
+        if self.transaction_depth > 0:
+
+            savepoint = f"kam_savepoint_{self.transaction_depth}"
+
+            cur = self.conn.cursor()
+            cur.execute(f"SAVEPOINT {savepoint};")
+
+            self.transaction_depth += 1
+
+            try:
+
+                yield self
+
+            except BaseException:
+
+                # rollback nested statements only
+                cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+                raise
+
+            else:
+
+                cur.execute(f"RELEASE SAVEPOINT {savepoint};")
+
+            finally:
+
+                self.transaction_depth -= 1
+
+            return
+
+        # outer transaction
+        self.transaction_depth += 1
+
+        try:
+
+            yield self
+
+        except BaseException:
+
+            self.transaction_depth -= 1
+            self.conn.rollback()
+            raise
+
+        else:
+
+            self.transaction_depth -= 1
+            self.conn.commit()
+
     def drop_database(self):
         """
         drop database
@@ -77,15 +457,13 @@ class SqlDatabase(BaseDatabase):
         # query
         drop_database_query = f"DROP DATABASE IF EXISTS {self.dbname};"
 
-        print()
-        print(drop_database_query)
-
         # cannot drop inside of a transaction
         self.conn.autocommit = True
 
         # drop database
         cur = self.conn.cursor()
-        cur.execute(drop_database_query)
+        with self.__instrument(cur, "drop_database", None, drop_database_query):
+            cur.execute(drop_database_query)
 
         # reset autocommit
         self.conn.autocommit = False
@@ -99,15 +477,13 @@ class SqlDatabase(BaseDatabase):
         create_database_query = f"CREATE DATABASE {self.dbname}" \
             + f"\nWITH OWNER = {self.user};"
 
-        print()
-        print(create_database_query)
-
         # cannot drop inside of a transaction
         self.conn.autocommit = True
 
         # drop database
         cur = self.conn.cursor()
-        cur.execute(create_database_query)
+        with self.__instrument(cur, "create_database", None, create_database_query):
+            cur.execute(create_database_query)
 
         # reset autocommit
         self.conn.autocommit = False
@@ -135,17 +511,15 @@ class SqlDatabase(BaseDatabase):
             + "\nEND;"
             + "\n$$ LANGUAGE plpgsql;")
 
-        print()
-        print(db_timestamps_trigger)
-
         # create trigger
         cur = self.conn.cursor()
-        cur.execute(db_timestamps_trigger)
+        with self.__instrument(cur, "create_database_timestamps_trigger_function", None, db_timestamps_trigger):
+            cur.execute(db_timestamps_trigger)
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
-    def __create_schema_template(self, env, template_name, table_columns, table_constraints):
+    def __create_schema_template(self, env, template_name, table_columns, table_constraints, table_indexes):
         """
         create schema template file
         """
@@ -156,7 +530,8 @@ class SqlDatabase(BaseDatabase):
         # apply template
         schema_code = schema_template.render(
             table_columns=table_columns,
-            table_constraints=table_constraints)
+            table_constraints=table_constraints,
+            table_indexes=table_indexes)
 
         # build schema path
         schema_target_path = schema_file_path()
@@ -168,7 +543,7 @@ class SqlDatabase(BaseDatabase):
         with open(schema_target_path, "w") as file:
             file.write(schema_code)
 
-        print(f"\n# wrote {schema_target_path}")
+        logger.info(f"# wrote {schema_target_path}")
 
     def _dump_schema_columns(self, schema_columns):
         """
@@ -203,14 +578,31 @@ class SqlDatabase(BaseDatabase):
         # retrieve schema constraints
         table_constraints = self.dump_constraints()
 
+        # retrieve schema indexes, predicates are written as python literals
+        table_indexes = {}
+
+        for table, indexes in self.dump_indexes().items():
+            table_indexes[table] = [dict(index, where=repr(index["where"])) for index in indexes]
+
         # create model migration file
-        self.__create_schema_template(env, TEMPLATE_SCHEMA_FILENAME, table_columns, table_constraints)
+        self.__create_schema_template(env, TEMPLATE_SCHEMA_FILENAME, table_columns, table_constraints, table_indexes)
 
     def dump_schema(self):
         """
         dump database schema
         """
 
+        # retrieve schema columns
+        schema_columns = self.query_schema_columns()
+
+        # dump schema columns
+        self._dump_schema_columns(schema_columns)
+
+    def query_schema_columns(self):
+        """
+        query database columns
+        """
+
         # query
         query_schema = (
             "SELECT table_name, ordinal_position, column_name, is_nullable, udt_name"
@@ -219,18 +611,97 @@ class SqlDatabase(BaseDatabase):
             + "\nAND table_schema = 'public'"
             + "\nORDER BY table_name, ordinal_position;")
 
-        print()
-        print(query_schema)
-
         # create trigger
         cur = self.conn.cursor()
-        cur.execute(query_schema)
+        with self.__instrument(cur, "query_schema_columns", None, query_schema):
+            cur.execute(query_schema)
 
         # fetch results
-        schema_columns = cur.fetchall()
+        return cur.fetchall()
 
-        # dump schema columns
-        self._dump_schema_columns(schema_columns)
+    def dump_schema_cache(self, migrations_checksum):
+        """
+        dump database schema (columns, constraints and indexes) in db/schema_cache.json
+        """
+
+        # convert schema columns to table columns
+        tables = {}
+
+        for table, _, column, _, udt_name in self.query_schema_columns():
+
+            table_content = tables.setdefault(table, dict(columns={}, constraints={}, indexes=[]))
+            table_content["columns"][column] = DB_TO_KAM_DATATYPE[udt_name]
+
+        # tables are defined with timestamps (see db/schema.py)
+        for table, table_content in tables.items():
+            table_content["columns"]["timestamps"] = True
+
+        # fill table constraints and indexes
+        for table, constraints in self.dump_constraints().items():
+            tables[table]["constraints"] = {c: content["foreign_table"] for c, content in constraints.items()}
+
+        for table, indexes in self.dump_indexes().items():
+            tables[table]["indexes"] = indexes
+
+        # build schema cache
+        schema_cache = dict(
+            version=SCHEMA_CACHE_VERSION,
+            migrations_checksum=migrations_checksum,
+            tables=tables)
+
+        # build schema cache path
+        schema_cache_path = schema_cache_file_path()
+
+        # create directory
+        os.makedirs(os.path.dirname(schema_cache_path), exist_ok=True)
+
+        # write schema cache
+        with open(schema_cache_path, "w") as file:
+            json.dump(schema_cache, file, separators=(",", ":"), sort_keys=True)
+
+        logger.info(f"# wrote {schema_cache_path}")
+
+    def dump_indexes(self):
+        """
+        dump database indexes (primary keys excepted)
+        """
+
+        # query
+        query_indexes = (
+            "SELECT"
+            + "\n  t.relname AS table_name,"
+            + "\n  i.relname AS index_name,"
+            + "\n  ARRAY("
+            + "\n    SELECT pg_get_indexdef(ix.indexrelid, k, true)"
+            + "\n    FROM generate_series(1, ix.indnatts) AS k"
+            + "\n    ORDER BY k) AS columns,"
+            + "\n  ix.indisunique AS is_unique,"
+            + "\n  pg_get_expr(ix.indpred, ix.indrelid) AS predicate"
+            + "\nFROM pg_index ix"
+            + "\n  JOIN pg_class t ON t.oid = ix.indrelid"
+            + "\n  JOIN pg_class i ON i.oid = ix.indexrelid"
+            + "\n  JOIN pg_namespace n ON n.oid = t.relnamespace"
+            + "\nWHERE n.nspname = 'public'"
+            + "\n  AND NOT ix.indisprimary"
+            + "\nORDER BY t.relname, i.relname;")
+
+        # select indexes
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "dump_indexes", None, query_indexes):
+            cur.execute(query_indexes)
+
+        # convert schema indexes to table indexes
+        table_indexes = {}
+
+        for table, name, columns, unique, predicate in cur.fetchall():
+
+            table_indexes.setdefault(table, []).append(dict(
+                name=name,
+                columns=columns,
+                unique=unique,
+                where=predicate))
+
+        return table_indexes
 
     def _dump_schema_constraints(self, schema_constraints):
         """
@@ -280,12 +751,10 @@ class SqlDatabase(BaseDatabase):
             + "\n  AND tc.table_schema = 'public'"
             + "\n  AND ccu.table_schema = 'public';")
 
-        print()
-        print(query_constraints)
-
         # select contraints
         cur = self.conn.cursor()
-        cur.execute(query_constraints)
+        with self.__instrument(cur, "dump_constraints", None, query_constraints):
+            cur.execute(query_constraints)
 
         # fetch results
         schema_constraints = cur.fetchall()
@@ -302,7 +771,8 @@ class SqlDatabase(BaseDatabase):
 
         # retrieve content of migrations table
         cur = self.conn.cursor()
-        cur.execute(check_migrations_table)
+        with self.__instrument(cur, "migrations_table_exists", None, check_migrations_table):
+            cur.execute(check_migrations_table)
         tables = cur.fetchall()
 
         # check whether migration table exists
@@ -322,26 +792,26 @@ class SqlDatabase(BaseDatabase):
 
         # create migrations table
         cur = self.conn.cursor()
-        cur.execute(create_migrations_table)
+        with self.__instrument(cur, "create_migrations_table", "schema_migrations", create_migrations_table):
+            cur.execute(create_migrations_table)
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
     def mark_migration_done(self, migration):
 
-        # TODO: use postgres prepared statements
-
         # query
-        set_migration_done = f"""
-        INSERT INTO schema_migrations (version) values({migration});
+        set_migration_done = """
+        INSERT INTO schema_migrations (version) values(%s);
         """
 
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(set_migration_done)
+        with self.__instrument(cur, "mark_migration_done", "schema_migrations", set_migration_done, [str(migration)]):
+            cur.execute(set_migration_done, [str(migration)])
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
     def retrieve_migrations(self):
 
@@ -352,7 +822,8 @@ class SqlDatabase(BaseDatabase):
 
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(get_migrations)
+        with self.__instrument(cur, "retrieve_migrations", "schema_migrations", get_migrations):
+            cur.execute(get_migrations)
         migrations = cur.fetchall()
 
         return [m[0] for m in migrations]
@@ -362,7 +833,7 @@ class SqlDatabase(BaseDatabase):
         # check migrations table existence
         if not self.migrations_table_exists():
 
-            print("\ncreate migrations table")
+            logger.info("create migrations table")
             self.create_migrations_table()
 
         # retrieve migrations
@@ -370,13 +841,65 @@ class SqlDatabase(BaseDatabase):
 
         return migrations
 
+    def __column_spec(self, column, spec):
+        """
+        build column spec from a data type or a dict(type=..., null=..., on_delete=...)
+        references are not null by default
+        """
+
+        # convert data type
+        if not isinstance(spec, dict):
+            spec = dict(type=spec)
+
+        data_type = spec.get("type")
+
+        column_spec = dict(
+            type=data_type,
+            null=spec.get("null", data_type != "references"),
+            on_delete=spec.get("on_delete"))
+
+        # validate on delete action
+        on_delete = column_spec["on_delete"]
+
+        if on_delete is not None:
+
+            if data_type != "references":
+                raise ValueError(f"Invalid on_delete for {column}, only supported by references 🤒")
+
+            if on_delete not in ON_DELETE_ACTIONS:
+                raise ValueError(f"Invalid on_delete {on_delete}, supported: {', '.join(ON_DELETE_ACTIONS)} 🤒")
+
+            if on_delete == "nullify" and not column_spec["null"]:
+                raise ValueError(f"Invalid on_delete nullify for {column}, the reference is not null 🤒")
+
+        return column_spec
+
+    def __foreign_key(self, reference, on_delete=None):
+        """
+        build foreign key constraint of a reference
+        """
+
+        # generate fk unique id
+        unique_fk_id = uuid.uuid4().hex
+
+        foreign_key = (
+            f"CONSTRAINT fk_kam_{unique_fk_id} "
+            + f"FOREIGN KEY (\"{reference}_id\") "
+            + f"REFERENCES public.{pluralize(reference)}(id)")
+
+        if on_delete is not None:
+            foreign_key += f" ON DELETE {ON_DELETE_ACTIONS[on_delete]}"
+
+        return foreign_key
+
     def create_table(self, table_name, columns):
         """
         called by active record migration
+        column values are data types or dict(type=..., null=..., on_delete=...) specs
         """
 
         # build column list
-        column_list = {k: v for k, v in columns.items() if k != "timestamps"}
+        column_list = {k: self.__column_spec(k, v) for k, v in columns.items() if k != "timestamps"}
 
         # retrieve timestamps
         timestamps = columns.get("timestamps", True)
@@ -387,22 +910,25 @@ class SqlDatabase(BaseDatabase):
             "id BIGSERIAL NOT NULL"]
 
         # add columns
-        for column, data_type in column_list.items():
+        for column, column_spec in column_list.items():
+
+            data_type = column_spec["type"]
+            null = "NULL" if column_spec["null"] else "NOT NULL"
 
             if data_type == "string":
-                statements.append(f"\"{column}\" VARCHAR NULL")
+                statements.append(f"\"{column}\" VARCHAR {null}")
             elif data_type == "text":
-                statements.append(f"\"{column}\" TEXT NULL")
+                statements.append(f"\"{column}\" TEXT {null}")
             elif data_type == "integer":
-                statements.append(f"\"{column}\" BIGINT NULL")
+                statements.append(f"\"{column}\" BIGINT {null}")
             elif data_type == "float":
-                statements.append(f"\"{column}\" DOUBLE PRECISION NULL")
+                statements.append(f"\"{column}\" DOUBLE PRECISION {null}")
             elif data_type == "boolean":
-                statements.append(f"\"{column}\" BOOLEAN NULL")
+                statements.append(f"\"{column}\" BOOLEAN {null}")
             elif data_type == "datetime":
-                statements.append(f"\"{column}\" TIMESTAMPTZ NULL")
+                statements.append(f"\"{column}\" TIMESTAMPTZ {null}")
             elif data_type == "references":
-                statements.append(f"{column}_id BIGSERIAL NOT NULL")
+                statements.append(f"\"{column}_id\" BIGINT {null}")
             else:
                 raise ValueError(f"Invalid data type {data_type}, supported: {', '.join(SUPPORTED_DATA_TYPES)} 🤒")
 
@@ -416,17 +942,10 @@ class SqlDatabase(BaseDatabase):
         statements.append(f"CONSTRAINT {table_name}_pkey PRIMARY KEY (id)")
 
         # add foreign keys
-        for column, data_type in column_list.items():
-
-            if data_type == "references":
+        for column, column_spec in column_list.items():
 
-                # generate fk unique id
-                unique_fk_id = uuid.uuid4().hex
-
-                statements.append(
-                    f"CONSTRAINT fk_kam_{unique_fk_id} "
-                    + f"FOREIGN KEY ({column}_id) "
-                    + f"REFERENCES public.{pluralize(column)}(id)")
+            if column_spec["type"] == "references":
+                statements.append(self.__foreign_key(column, on_delete=column_spec["on_delete"]))
 
         # add table end
         statements.append(");")
@@ -438,21 +957,79 @@ class SqlDatabase(BaseDatabase):
             + ",\n".join(statements[1:-1])
             + statements[-1])
 
-        print()
-        print(create_table)
-
         # create migrations table
         cur = self.conn.cursor()
-        cur.execute(create_table)  # create table does not seem to support prepared statements
+        with self.__instrument(cur, "create_table", table_name, create_table):
+            cur.execute(create_table)  # create table does not seem to support prepared statements
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
         # create table timestamps trigger
         if timestamps:
 
             self.add_table_timestamps_trigger(table_name)
 
+        # index references (joined by has_many and belongs_to relations)
+        for column, column_spec in column_list.items():
+
+            if column_spec["type"] == "references":
+                self.add_index(table_name, [f"{column}_id"])
+
+    def change_reference(self, table_name, reference, null=False, on_delete=None):
+        """
+        called by active record migration
+        convert a reference column created as BIGSERIAL to a plain BIGINT foreign key
+        and set its nullability and on delete action
+        """
+
+        # validate spec
+        self.__column_spec(reference, dict(type="references", null=null, on_delete=on_delete))
+
+        column = f"{reference}_id"
+
+        with self.transaction():
+
+            cur = self.conn.cursor()
+
+            # retrieve the sequence owned by the column
+            sequence_query = "SELECT pg_get_serial_sequence(%s, %s);"
+
+            with self.__instrument(cur, "change_reference", table_name, sequence_query, [table_name, column]):
+                cur.execute(sequence_query, [table_name, column])
+            sequence = cur.fetchone()[0]
+
+            # retrieve the foreign keys of the column
+            foreign_keys_query = (
+                "SELECT con.conname"
+                + "\nFROM pg_constraint con"
+                + "\nJOIN pg_class rel ON rel.oid = con.conrelid"
+                + "\nJOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = ANY(con.conkey)"
+                + "\nWHERE con.contype = 'f' AND rel.relname = %s AND att.attname = %s;")
+
+            with self.__instrument(cur, "change_reference", table_name, foreign_keys_query, [table_name, column]):
+                cur.execute(foreign_keys_query, [table_name, column])
+            foreign_keys = [row[0] for row in cur.fetchall()]
+
+            # query
+            statements = []
+
+            if sequence is not None:
+                statements += [
+                    f"ALTER TABLE {table_name} ALTER COLUMN \"{column}\" DROP DEFAULT;",
+                    f"DROP SEQUENCE {sequence};"]
+
+            statements.append(
+                f"ALTER TABLE {table_name} ALTER COLUMN \"{column}\" {'DROP' if null else 'SET'} NOT NULL;")
+
+            statements += [f"ALTER TABLE {table_name} DROP CONSTRAINT {fk};" for fk in foreign_keys]
+            statements.append(f"ALTER TABLE {table_name} ADD {self.__foreign_key(reference, on_delete=on_delete)};")
+
+            for statement in statements:
+
+                with self.__instrument(cur, "change_reference", table_name, statement):
+                    cur.execute(statement)
+
     def add_table_timestamps_trigger(self, table_name):
         """
         add trigger for table timestamps
@@ -464,15 +1041,13 @@ class SqlDatabase(BaseDatabase):
             + "\nFOR EACH ROW"
             + "\nEXECUTE PROCEDURE trigger_set_timestamp();")
 
-        print()
-        print(table_triggers_query)
-
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(table_triggers_query)
+        with self.__instrument(cur, "add_table_timestamps_trigger", table_name, table_triggers_query):
+            cur.execute(table_triggers_query)
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
     def destroy_all(self, table_name):
         """
@@ -482,39 +1057,105 @@ class SqlDatabase(BaseDatabase):
         # query
         destroy_all_query = f"DELETE FROM {table_name};"
 
-        print(destroy_all_query)
-
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(destroy_all_query)
+        with self.__instrument(cur, "destroy_all", table_name, destroy_all_query):
+            cur.execute(destroy_all_query)
 
         # commit
-        self.conn.commit()
+        self.__commit()
 
-    def select_all(self, table_name):
+    def __where_clauses(self, alias, table_schema, conditions):
         """
-        called by active record
+        build where clauses for the conditions on a table alias
         """
 
-        # query
-        select_all_query = f"SELECT * FROM {table_name};"
+        # iterate through conditions
+        where_clauses = []
+        query_params = []
 
-        print(select_all_query)
+        for column, value in conditions.items():
 
-        # retrieve migrations
-        cur = self.conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(select_all_query)
+            # validate column
+            if column not in table_schema:
+                raise ValueError(f"Invalid column {column} 🤒")
 
-        # fetch results
-        all_rows = cur.fetchall()
+            # bind values (the query text only depends on the shape of the conditions)
+            where_clause, where_params = where_condition(f"{alias}.\"{column}\"", value)
+
+            where_clauses.append(f"\n{where_clause}")
+            query_params += where_params
 
-        return all_rows
+        return where_clauses, query_params
 
-    def select_where(self, model_table_name, table_schema, through=[], **kwargs):
+    def __select_list(self, alias, table_schema, columns):
         """
-        called by active record
+        build select list for the columns of a table alias (all columns by default)
+        """
+
+        if columns is None:
+            return f"{alias}.*"
+
+        # validate columns
+        for column in columns:
+            if column not in table_schema:
+                raise ValueError(f"Invalid column {column} 🤒")
+
+        return ", ".join([f"{alias}.\"{column}\"" for column in columns])
+
+    def __aggregate_expression(self, alias, table_schema, aggregate):
+        """
+        build aggregate expression over a column of a table alias (rows for count without column)
+        """
+
+        function, column = aggregate
+
+        # validate function
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Invalid aggregate {function}, supported: {', '.join(AGGREGATE_FUNCTIONS)} 🤒")
+
+        if column is None:
+
+            if function != "count":
+                raise ValueError(f"Missing column for aggregate {function} 🤒")
+
+            return "COUNT(*)"
+
+        # validate column
+        if column not in table_schema:
+            raise ValueError(f"Invalid column {column} 🤒")
+
+        return f"{AGGREGATE_FUNCTIONS[function]}({alias}.\"{column}\")"
+
+    def __select_query(
+            self, model_table_name, table_schema, through=[],
+            target_schema=None, target_conditions={}, columns=None,
+            aggregate=None, group=[],
+            order=[], limit=None, offset=None, owner_key=False, **kwargs):
+        """
+        build select query for the target rows
+        columns restricts the selected target columns
+        aggregate (function, column) computes an aggregate of the target rows, by group columns if any
+        owner_key selects the id of the model row as kam_owner_id (eager loading)
         """
 
+        # retrieve target schema
+        select_schema = table_schema if target_schema is None else target_schema
+
+        # aggregate a window of the target rows through a subquery
+        if aggregate is not None and len(group) == 0 and (limit is not None or offset is not None):
+
+            window_query, query_params, target_table = self.__select_query(
+                model_table_name, table_schema, through=through,
+                target_schema=target_schema, target_conditions=target_conditions,
+                order=order, limit=limit, offset=offset, **kwargs)
+
+            aggregate_query = (
+                f"SELECT {self.__aggregate_expression('kam_rows', select_schema, aggregate)} AS kam_aggregate"
+                + f"\nFROM ({window_query.rstrip(';')}) kam_rows;")
+
+            return aggregate_query, query_params, target_table
+
         # retrieve table aliases
         model_alias, through_alias = retrieve_table_alias(
             model_table_name, through)
@@ -524,17 +1165,37 @@ class SqlDatabase(BaseDatabase):
         target_table = model_table_name if len(through) == 0 else through[-1]
 
         # query
-        select_all_query = (
-            f"SELECT {target_alias}.*"
-            + f"\nFROM {model_table_name} {model_alias}")
+        if aggregate is None:
+
+            select_all_query = "SELECT " + self.__select_list(target_alias, select_schema, columns)
+
+        else:
+
+            select_list = []
+
+            # select group columns
+            if len(group) > 0:
+                select_list.append(self.__select_list(target_alias, select_schema, group))
+            else:
+                order = []  # order only applies to groups
+
+            select_list.append(
+                f"{self.__aggregate_expression(target_alias, select_schema, aggregate)} AS kam_aggregate")
+
+            select_all_query = "SELECT " + ", ".join(select_list)
+
+        if owner_key:
+            select_all_query += f", {model_alias}.id AS kam_owner_id"
+
+        select_all_query += f"\nFROM {model_table_name} {model_alias}"
 
         # iterate through join tables
-        previous_table = singularize(model_table_name) if is_plural(model_table_name) else model_table_name
+        previous_table = REGISTRY.table_ref(model_table_name)
         previous_alias = model_alias
         for join_table, join_alias in zip(through, through_alias):
 
             # check relation direction
-            if is_plural(join_table):
+            if REGISTRY.is_plural(join_table):
 
                 select_all_query += (
                     f"\nJOIN {join_table} {join_alias} "
@@ -544,48 +1205,159 @@ class SqlDatabase(BaseDatabase):
             else:
 
                 select_all_query += (
-                    f"\nJOIN {pluralize(join_table)} {join_alias} "
+                    f"\nJOIN {REGISTRY.table_name(join_table)} {join_alias} "
                     + f"ON {join_alias}.id "
                     + f"= {previous_alias}.\"{join_table}_id\"")
 
             # set next alias
-            previous_table = singularize(join_table) if is_plural(join_table) else join_table
+            previous_table = REGISTRY.table_ref(join_table)
             previous_alias = join_alias
 
-        # filters
-        select_all_query += "\nWHERE"
+        # filters on the model table and on the target table
+        where_clauses, query_params = self.__where_clauses(model_alias, table_schema, kwargs)
+        target_clauses, target_params = self.__where_clauses(
+            target_alias,
+            table_schema if target_schema is None else target_schema,
+            target_conditions)
 
-        # iterate through arguments
-        where_clauses = []
+        where_clauses += target_clauses
+        query_params += target_params
 
-        for column, value in kwargs.items():
+        if len(where_clauses) > 0:
+            select_all_query += "\nWHERE" + "\nAND".join(where_clauses)
 
-            # get column data type
-            column_data_type = table_schema[column]
+        # group target rows
+        if aggregate is not None and len(group) > 0:
+            select_all_query += "\nGROUP BY " + self.__select_list(target_alias, select_schema, group)
 
-            # fill value
-            if column_data_type in ["string", "text", "datetime"]:
-                where_clauses.append(f"\n{model_alias}.\"{column}\" = '{value}'")
-            else:  # if column_data_type == "integer":
-                where_clauses.append(f"\n{model_alias}.\"{column}\" = {value}")
+        # order target rows
+        if len(order) > 0:
 
-        # join where clauses
-        select_all_query += (
-            "\nAND".join(where_clauses)
-            + ";")
+            # validate columns (tables with timestamps are ordered by their timestamp columns)
+            for column, _ in order:
+                if column not in select_schema and not (
+                        column in SqlDatabase.TIMESTAMP_COLUMNS and select_schema.get("timestamps")):
+                    raise ValueError(f"Invalid column {column} 🤒")
 
-        print(select_all_query)
+            select_all_query += "\nORDER BY " + ", ".join(
+                [f"{target_alias}.\"{column}\" {direction.upper()}" for column, direction in order])
 
-        # retrieve migrations
-        cur = self.conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(select_all_query)
+        # restrict target rows
+        if limit is not None:
+            select_all_query += "\nLIMIT %s"
+            query_params.append(int(limit))
 
-        # fetch results
-        matching_rows = cur.fetchall()
+        if offset is not None:
+            select_all_query += "\nOFFSET %s"
+            query_params.append(int(offset))
+
+        select_all_query += ";"
+
+        return select_all_query, query_params, target_table
+
+    def select_tuples_where(self, model_table_name, table_schema, through=[], **kwargs):
+        """
+        called by active record
+        return the column names of the matching rows along with the rows as tuples
+        (no dict is allocated per row)
+        """
+
+        # build query
+        select_all_query, query_params, _ = self.__select_query(
+            model_table_name, table_schema, through=through, **kwargs)
+
+        # retrieve tuples
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "select", model_table_name, select_all_query, query_params):
+            self.__execute_prepared(cur, "select", model_table_name, select_all_query, query_params)
+
+        # resolve columns once per result set
+        columns = tuple([description[0] for description in cur.description])
+
+        return columns, cur.fetchall()
+
+    def pluck_where(self, model_table_name, table_schema, columns, through=[], **kwargs):
+        """
+        called by active record
+        return the column values of the matching rows as tuples
+        """
+
+        # build query
+        select_all_query, query_params, _ = self.__select_query(
+            model_table_name, table_schema, through=through, columns=columns, **kwargs)
+
+        # retrieve tuples
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "pluck", model_table_name, select_all_query, query_params):
+            self.__execute_prepared(cur, "pluck", model_table_name, select_all_query, query_params)
+
+        return cur.fetchall()
+
+    def aggregate_where(self, model_table_name, table_schema, aggregate, group=[], through=[], **kwargs):
+        """
+        called by active record
+        return the aggregate (function, column) of the matching rows
+        or the (group values, aggregate) tuples of their groups
+        """
+
+        # build query
+        select_all_query, query_params, _ = self.__select_query(
+            model_table_name, table_schema, through=through, aggregate=aggregate, group=group, **kwargs)
+
+        # retrieve aggregates
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "aggregate", model_table_name, select_all_query, query_params):
+            self.__execute_prepared(cur, "aggregate", model_table_name, select_all_query, query_params)
+
+        rows = cur.fetchall()
 
-        # TODO: handle references
+        if len(group) == 0:
+            return rows[0][0]
 
-        return matching_rows, target_table
+        return rows
+
+    def select_in_batches(self, model_table_name, table_schema, through=[], batch_size=1000, **kwargs):
+        """
+        called by active record
+        stream matching rows in batches through a server side cursor
+        rows are tuples yielded along with the selected column names
+        """
+
+        # build query
+        select_all_query, query_params, _ = self.__select_query(
+            model_table_name, table_schema, through=through, **kwargs)
+
+        # named cursors are kept by the server, holding allows commits while iterating
+        cur = self.conn.cursor(
+            name=f"kam_batches_{uuid.uuid4().hex}",
+            withhold=True)
+        cur.itersize = batch_size
+
+        try:
+
+            with self.__instrument(cur, "select_in_batches", model_table_name, select_all_query, query_params):
+                cur.execute(select_all_query, query_params)
+
+            # fetch batches
+            columns = None
+
+            while True:
+
+                batch_rows = cur.fetchmany(batch_size)
+
+                if len(batch_rows) == 0:
+                    break
+
+                # resolve columns once per result set (named cursors describe rows once fetched)
+                if columns is None:
+                    columns = tuple([description[0] for description in cur.description])
+
+                yield columns, batch_rows
+
+        finally:
+
+            # release server side cursor
+            cur.close()
 
     def insert(self, table_name, table_schema, active_record, columns):
         """
@@ -639,19 +1411,457 @@ class SqlDatabase(BaseDatabase):
         # add end
         insert_query += "\n) RETURNING id;"
 
-        print(insert_query)
-
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(insert_query, query_params)
+        with self.__instrument(cur, "insert", table_name, insert_query, query_params):
+            self.__execute_prepared(cur, "insert", table_name, insert_query, query_params)
 
         # retrieve inserted id
         insert_res = cur.fetchone()
         active_record.id = insert_res[0]
 
         # commit
+        self.__commit()
+
+    def update_all(self, table_name, table_schema, rows, batch_size=1000):
+        """
+        called by active record
+        update rows given as (id, columns) pairs with batched statements
+        """
+
+        # group rows sharing the same columns in order to share statements
+        statements = {}
+
+        for id, columns in rows:
+
+            # skip timestamp columns
+            update_columns = tuple(c for c in columns.keys() if c not in SqlDatabase.TIMESTAMP_COLUMNS)
+
+            # validate columns
+            for column in update_columns:
+                if column not in table_schema:
+                    raise ValueError(f"Invalid column {column} 🤒")
+
+            # nothing to update
+            if len(update_columns) == 0:
+                continue
+
+            statements.setdefault(update_columns, []).append(
+                [columns[c] for c in update_columns] + [id])
+
+        cur = self.conn.cursor()
+
+        for update_columns, query_params in statements.items():
+
+            # query
+            update_query = (
+                f"UPDATE {table_name} SET "
+                + ", ".join([f"\"{column}\" = %s" for column in update_columns])
+                + "\nWHERE id = %s;")
+
+            # update rows by batches
+            with self.__instrument(cur, "update_all", table_name, update_query, query_params) as event:
+
+                execute_batch(cur, update_query, query_params, page_size=batch_size)
+
+                if event is not None:
+                    event["row_count"] = len(query_params)
+
+        # commit
+        self.__commit()
+
+    def __rows_columns(self, table_schema, rows):
+        """
+        retrieve the columns of all rows
+        """
+
+        columns = []
+
+        for row in rows:
+            for column in row.keys():
+
+                # skip timestamp columns
+                if column in SqlDatabase.TIMESTAMP_COLUMNS:
+                    continue
+
+                # validate column
+                if column not in table_schema:
+                    raise ValueError(f"Invalid column {column} 🤒")
+
+                if column not in columns:
+                    columns.append(column)
+
+        return columns
+
+    def insert_all(self, table_name, table_schema, rows, returning_ids=True, batch_size=1000):
+        """
+        called by active record
+        insert rows with multi row VALUES batches in a single transaction
+        """
+
+        # nothing to insert
+        if len(rows) == 0:
+            return []
+
+        # retrieve columns of all rows
+        columns = self.__rows_columns(table_schema, rows)
+
+        # query
+        column_names = ", ".join([f"\"{column}\"" for column in columns])
+        insert_all_query = f"INSERT INTO {table_name} ({column_names})\nVALUES %s"
+
+        if returning_ids:
+            insert_all_query += "\nRETURNING id"
+
+        insert_all_query += ";"
+
+        # build row values
+        values = [[row.get(column) for column in columns] for row in rows]
+
+        # insert rows by batches
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "insert_all", table_name, insert_all_query, values) as event:
+
+            insert_res = execute_values(
+                cur,
+                insert_all_query,
+                values,
+                page_size=batch_size,
+                fetch=returning_ids)
+
+            if event is not None:
+                event["row_count"] = len(values)
+
+        # commit
+        self.__commit()
+
+        # retrieve inserted ids
+        if returning_ids:
+            return [res[0] for res in insert_res]
+
+        return []
+
+    def upsert_all(
+            self, table_name, table_schema, rows, unique_by,
+            update_columns=None, returning_ids=True, batch_size=1000):
+        """
+        called by active record
+        insert rows or update the rows conflicting on the unique_by columns
+        with multi row VALUES batches in a single transaction
+        """
+
+        # nothing to upsert
+        if len(rows) == 0:
+            return []
+
+        # retrieve columns of all rows
+        columns = self.__rows_columns(table_schema, rows)
+
+        # validate unique columns
+        for column in unique_by:
+            if column not in columns:
+                raise ValueError(f"Invalid unique column {column}, missing from the rows 🤒")
+
+        # new rows cannot conflict on their id (and would insert a null id)
+        if "id" in unique_by and any(row.get("id") is None for row in rows):
+            raise ValueError("Invalid upsert on id, rows without id must be inserted 🤒")
+
+        # update all the other columns by default
+        if update_columns is None:
+            update_columns = [c for c in columns if c not in unique_by and c != "id"]
+
+        # validate update columns (conflicting rows are updated from the inserted values)
+        for column in update_columns:
+            if column not in columns:
+                raise ValueError(f"Invalid update column {column}, missing from the rows 🤒")
+
+        # retrieve the unique key of each row
+        keys = [tuple(row.get(c) for c in unique_by) for row in rows]
+
+        # a row cannot be updated twice by the same statement, the last row wins
+        # rows with a null unique value never conflict (nulls are distinct) and are all inserted
+        unique_rows = {}
+        null_rows = []
+
+        for key, row in zip(keys, rows):
+
+            if None in key:
+                null_rows.append(row)
+            else:
+                unique_rows[key] = row
+
+        # query
+        column_names = ", ".join([f"\"{column}\"" for column in columns])
+        unique_names = ", ".join([f"\"{column}\"" for column in unique_by])
+        upsert_all_query = (
+            f"INSERT INTO {table_name} ({column_names})"
+            + "\nVALUES %s"
+            + f"\nON CONFLICT ({unique_names})")
+
+        if len(update_columns) > 0:
+            upsert_all_query += "\nDO UPDATE SET " + ", ".join(
+                [f"\"{column}\" = EXCLUDED.\"{column}\"" for column in update_columns])
+        else:
+            upsert_all_query += "\nDO NOTHING"
+
+        # return ids along with the unique columns to map them back to the rows
+        if returning_ids:
+            upsert_all_query += f"\nRETURNING {unique_names}, id"
+
+        upsert_all_query += ";"
+
+        # build row values
+        values = [[row.get(column) for column in columns] for row in list(unique_rows.values()) + null_rows]
+
+        # upsert rows by batches
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "upsert_all", table_name, upsert_all_query, values) as event:
+
+            upsert_res = execute_values(
+                cur,
+                upsert_all_query,
+                values,
+                page_size=batch_size,
+                fetch=returning_ids)
+
+            if event is not None:
+                event["row_count"] = len(values)
+
+        # commit
+        self.__commit()
+
+        # retrieve upserted ids (skipped rows have no id)
+        if returning_ids:
+
+            ids = {}
+            null_ids = []
+
+            # ids of rows with a null unique value are returned in the order of their values
+            for res in upsert_res:
+
+                key = tuple(res[:-1])
+
+                if None in key:
+                    null_ids.append(res[-1])
+                else:
+                    ids[key] = res[-1]
+
+            null_ids = iter(null_ids)
+
+            return [next(null_ids) if None in key else ids.get(key) for key in keys]
+
+        return []
+
+    def __index_name(self, table_name, columns):
+        """
+        build default index name
+        """
+
+        return f"index_{table_name}_on_{'_and_'.join(columns)}"
+
+    def __execute_index_query(self, table_name, query, concurrently):
+        """
+        execute index query, concurrent index queries cannot run inside a transaction block
+        """
+
+        cur = self.conn.cursor()
+
+        if not concurrently:
+
+            with self.__instrument(cur, "index", table_name, query):
+                cur.execute(query)
+
+            self.__commit()
+
+            return
+
+        # validate transaction
+        if self.transaction_depth > 0:
+            raise ValueError("Concurrent index operations cannot run within a transaction 🤒")
+
+        # end the transaction opened by previous queries
         self.conn.commit()
 
+        self.conn.autocommit = True
+
+        try:
+            with self.__instrument(cur, "index", table_name, query):
+                cur.execute(query)
+        finally:
+            self.conn.autocommit = False
+
+    def add_index(self, table_name, columns, unique=False, name=None, where=None, concurrently=False):
+        """
+        called by active record migration
+        where is the sql predicate of a partial index
+        concurrently builds the index without locking writes on the table
+        """
+
+        # build index name
+        if name is None:
+            name = self.__index_name(table_name, columns)
+
+        # query
+        column_names = ", ".join([f"\"{column}\"" for column in columns])
+        add_index_query = (
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}{name}"
+            + f"\nON {table_name} ({column_names})")
+
+        if where is not None:
+            add_index_query += f"\nWHERE {where}"
+
+        # create index
+        self.__execute_index_query(table_name, add_index_query + ";", concurrently)
+
+    def remove_index(self, table_name, columns=None, name=None, concurrently=False):
+        """
+        called by active record migration
+        """
+
+        # build index name
+        if name is None:
+
+            if columns is None:
+                raise ValueError(f"Missing index columns or name for {table_name} 🤒")
+
+            name = self.__index_name(table_name, columns)
+
+        # query
+        remove_index_query = f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}{name};"
+
+        # drop index
+        self.__execute_index_query(table_name, remove_index_query, concurrently)
+
+    def __copy_options(self, file_format, header=False, force_null=[]):
+        """
+        build COPY options for a file format
+        """
+
+        # validate format
+        if file_format not in COPY_DELIMITERS:
+            raise ValueError(f"Invalid file format {file_format}, supported: {', '.join(COPY_DELIMITERS.keys())} 🤒")
+
+        # tsv files are not quoted, the text format escapes tabs, newlines and backslashes with a backslash
+        if file_format == "tsv":
+            return "(FORMAT text, NULL '')"
+
+        # csv files handle quoting
+        delimiter = COPY_DELIMITERS[file_format]
+        options = ["FORMAT csv", f"DELIMITER E'{delimiter}'"]
+
+        if header:
+            options.append("HEADER true")
+
+        # quoted empty values of non string columns are loaded as NULL
+        if len(force_null) > 0:
+            options.append("FORCE_NULL (" + ", ".join([f"\"{column}\"" for column in force_null]) + ")")
+
+        return "(" + ", ".join(options) + ")"
+
+    def copy_from(self, table_name, table_schema, file, file_format="csv", chunk_size=COPY_CHUNK_SIZE):
+        """
+        stream a csv or tsv file with a header row into a table
+        """
+
+        # read header row, the rest of the file is streamed by COPY
+        header = file.readline()
+
+        if file_format == "tsv":
+            columns = header.rstrip("\r\n").split("\t")
+        else:
+            columns = next(csv.reader([header], delimiter=COPY_DELIMITERS.get(file_format, ",")))
+
+        # validate columns
+        for column in columns:
+            if column not in table_schema:
+                raise ValueError(f"Invalid column {column} for table {table_name} 🤒")
+
+        # non string columns (csv files only, empty tsv fields are NULL)
+        force_null = [c for c in columns if table_schema[c] not in ["string", "text"]]
+
+        # query
+        column_names = ", ".join([f"\"{column}\"" for column in columns])
+        copy_from_query = (
+            f"COPY {table_name} ({column_names})"
+            + "\nFROM STDIN"
+            + f"\nWITH {self.__copy_options(file_format, force_null=force_null)};")
+
+        # stream file by chunks
+        cur = self.conn.cursor()
+        with self.__instrument(cur, "copy_from", table_name, copy_from_query):
+            cur.copy_expert(copy_from_query, file, size=chunk_size)
+
+        # keep id sequence after loaded ids
+        if "id" in columns:
+
+            setval_query = (
+                f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                + f"COALESCE(MAX(id), 1)) FROM {table_name};")
+
+            with self.__instrument(cur, "copy_from", table_name, setval_query):
+                cur.execute(setval_query)
+
+        # commit
+        self.__commit()
+
+    def __copy_header(self, cur, select_query, file):
+        """
+        write the header row of a tsv file (the text format has no header before postgres 15)
+        """
+
+        cur.execute(f"SELECT * FROM ({select_query}) kam_header LIMIT 0;")
+
+        file.write("\t".join([description[0] for description in cur.description]) + "\n")
+
+    def copy_to(self, table_name, file, file_format="csv", chunk_size=COPY_CHUNK_SIZE):
+        """
+        stream a table with a header row into a csv or tsv file
+        """
+
+        # query
+        copy_to_query = (
+            f"COPY {table_name}"
+            + "\nTO STDOUT"
+            + f"\nWITH {self.__copy_options(file_format, header=True)};")
+
+        cur = self.conn.cursor()
+
+        if file_format == "tsv":
+            self.__copy_header(cur, f"SELECT * FROM {table_name}", file)
+
+        # stream table
+        with self.__instrument(cur, "copy_to", table_name, copy_to_query):
+            cur.copy_expert(copy_to_query, file, size=chunk_size)
+
+    def copy_where(
+            self, model_table_name, table_schema, file, through=[],
+            file_format="csv", chunk_size=COPY_CHUNK_SIZE, **kwargs):
+        """
+        called by active record
+        stream matching rows with a header row into a csv or tsv file
+        """
+
+        # build query
+        select_all_query, query_params, _ = self.__select_query(
+            model_table_name, table_schema, through=through, **kwargs)
+
+        # bind parameters, COPY does not accept them
+        cur = self.conn.cursor()
+        select_query = cur.mogrify(select_all_query.rstrip(";"), query_params).decode()
+
+        # query
+        copy_to_query = (
+            f"COPY ({select_query})"
+            + "\nTO STDOUT"
+            + f"\nWITH {self.__copy_options(file_format, header=True)};")
+
+        if file_format == "tsv":
+            self.__copy_header(cur, select_query, file)
+
+        # stream rows
+        with self.__instrument(cur, "copy_where", model_table_name, copy_to_query):
+            cur.copy_expert(copy_to_query, file, size=chunk_size)
+
     def update(self, table_name, table_schema, id, columns):
         """
         called by active record
@@ -682,16 +1892,20 @@ class SqlDatabase(BaseDatabase):
                 update_rows.append(f"\n\"{column}\" = %s")
                 query_params.append(value)
 
+        # nothing to update (only timestamp columns changed)
+        if len(update_rows) == 0:
+            return
+
         update_query += ", ".join(update_rows)
 
         # add separator
-        update_query += f"\nWHERE id = {id};"
-
-        print(update_query)
+        update_query += "\nWHERE id = %s;"
+        query_params.append(id)
 
         # retrieve migrations
         cur = self.conn.cursor()
-        cur.execute(update_query, query_params)
+        with self.__instrument(cur, "update", table_name, update_query, query_params):
+            self.__execute_prepared(cur, "update", table_name, update_query, query_params)
 
         # commit
-        self.conn.commit()
+        self.__commit()
@@ -3,11 +3,15 @@ from kam.app.models.active_record import ActiveRecord
 
 
 class {{model_klass_name}}(ActiveRecord):
-
-    def __init__(self, **kwargs):
-
-        # retrieve {{model_klass_name.lower()}} attributes
-        super().__init__(**kwargs)
+{% if slots %}
+    # compact instances without __dict__ (add the columns and references of later migrations)
+    __slots__ = ({% for slot in slots %}"{{slot}}"{% if not loop.last %}, {% endif %}{% endfor %})
+{% endif %}
+    @classmethod
+    def relations(cls):
+
+        # declare {{model_klass_name.lower()}} relations (cls.belongs_to("model") or cls.has_many("models"))
+        pass
 
     def __repr__(self):
 
@@ -10,7 +10,10 @@ def define(self):{% for table_name, columns in table_columns.items() %}
             {{column["column"]}}="{{column["data_type"]}}",{% endfor %}
             timestamps=True),
         dict({% for constraint, content in table_constraints.get(table_name, {}).items() %}
-            {{constraint}}="{{content["foreign_table"]}}",{% endfor %})){% endfor %}
+            {{constraint}}="{{content["foreign_table"]}}",{% endfor %}),
+        [{% for index in table_indexes.get(table_name, []) %}
+            dict(name="{{index["name"]}}", columns={{index["columns"]}}, unique={{index["unique"]}}, where={{index["where"]}}),{% endfor %}
+        ]){% endfor %}
 
 
 ActiveRecordSchema.define(define)
@@ -12,4 +12,6 @@ setup(name="kam",
       description="kam",
       packages=find_packages(),
       install_requires=requirements,
+      extras_require=dict(
+          analytics=["numpy", "pandas"]),
       scripts=[os.path.join("scripts", "kam")])
@@ -0,0 +1,135 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+from kam.app.controllers import database_controller  # noqa: E402
+from kam.app.models.active_record_schema import ActiveRecordSchema  # noqa: E402
+from kam.app.models.sql_database import SqlDatabase  # noqa: E402
+from kam.app.helpers import file  # noqa: E402
+
+import os  # noqa: E402
+import json  # noqa: E402
+
+
+SCHEMA = """
+from kam.app.models.active_record_schema import ActiveRecordSchema
+
+
+def define(self):
+
+    self.create_table(
+        "assessments",
+        dict(
+            id="integer",
+            name="string",
+            timestamps=True),
+        dict())
+
+
+ActiveRecordSchema.define(define)
+"""
+
+MIGRATIONS = ["20220101000000_create_assessments.py", "20220102000000_create_skills.py"]
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    temporary project with migrations and a db/schema.py, along with an unloaded schema
+    """
+
+    monkeypatch.setattr(file, "get_project_directory", lambda: str(tmp_path))
+
+    # restore the schema of other tests on teardown
+    monkeypatch.setattr(ActiveRecordSchema, "db_schema", {})
+    monkeypatch.setattr(ActiveRecordSchema, "loaded", False)
+
+    os.makedirs(tmp_path / "db" / "migrate")
+
+    for migration in MIGRATIONS:
+        (tmp_path / "db" / "migrate" / migration).write_text("")
+
+    (tmp_path / "db" / "schema.py").write_text(SCHEMA)
+
+    return tmp_path
+
+
+def dump_schema_cache(migrations):
+    """
+    dump the schema cache of a database with an assessments and a skills table
+    """
+
+    db = SqlDatabase(dict(connection={}))
+
+    db.query_schema_columns = lambda: [
+        ("assessments", None, "id", None, "int8"),
+        ("assessments", None, "name", None, "varchar"),
+        ("skills", None, "id", None, "int8"),
+        ("skills", None, "assessment_id", None, "int8")]
+    db.dump_constraints = lambda: dict(skills=dict(assessment_id=dict(foreign_table="assessments")))
+    db.dump_indexes = lambda: {}
+
+    db.dump_schema_cache(database_controller.migrations_checksum(
+        [database_controller.migration_timestamp(m) for m in migrations]))
+
+
+class TestSchemaCache:
+
+    def test_fresh_cache(self, project):
+        """
+        test a cache matching the migrations is loaded instead of db/schema.py
+        """
+
+        dump_schema_cache(MIGRATIONS)
+
+        with open(project / "db" / "schema_cache.json", "r") as file:
+            schema_cache = json.load(file)
+
+        assert schema_cache["tables"]["skills"]["constraints"] == dict(assessment_id="assessments")
+
+        assert database_controller.load_schema_cache()
+
+        db_schema = database_controller.ensure_schema()
+
+        assert sorted(db_schema.keys()) == ["assessments", "skills"]
+        assert db_schema["assessments"]["columns"] == dict(id="integer", name="string", timestamps=True)
+
+    def test_stale_checksum(self, project):
+        """
+        test a cache dumped for other migrations falls back to db/schema.py
+        """
+
+        dump_schema_cache(MIGRATIONS[:1])
+
+        assert not database_controller.load_schema_cache()
+
+        db_schema = database_controller.ensure_schema()
+
+        assert list(db_schema.keys()) == ["assessments"]
+
+    def test_missing_cache(self, project):
+        """
+        test a missing cache falls back to db/schema.py
+        """
+
+        assert not database_controller.load_schema_cache()
+
+        db_schema = database_controller.ensure_schema()
+
+        assert list(db_schema.keys()) == ["assessments"]
+        assert ActiveRecordSchema.loaded
+
+    def test_table_schema_keeps_loaded_schema(self, project):
+        """
+        test import and export reuse the loaded schema
+        """
+
+        database_controller.ensure_schema()
+
+        generation = ActiveRecordSchema.generation
+
+        with pytest.raises(ValueError, match="Invalid table skills"):
+            database_controller.export_table("skills", str(project / "skills.csv"))
+
+        assert ActiveRecordSchema.generation == generation
@@ -0,0 +1,61 @@
+
+from kam.app.helpers.columns import (
+    rows_to_columns,
+    columns_to_dataframe)
+
+from datetime import datetime, timezone
+
+import pytest
+
+
+COLUMN_TYPES = dict(
+    id="integer",
+    name="string",
+    score="float",
+    active="boolean",
+    created_at="datetime")
+
+BATCHES = [
+    [(1, "a", 1.5, True, datetime(2021, 1, 1, tzinfo=timezone.utc)),
+     (2, None, None, None, None)],
+    [(None, "c", 3.0, False, datetime(2021, 1, 3, tzinfo=timezone.utc))]]
+
+
+class TestColumns:
+
+    def test_rows_to_columns(self):
+        """
+        test batches are converted to typed masked arrays
+        """
+
+        np = pytest.importorskip("numpy")
+
+        arrays = rows_to_columns(BATCHES, list(COLUMN_TYPES.keys()), COLUMN_TYPES)
+
+        assert arrays["id"].dtype == np.int64
+        assert arrays["id"].mask.tolist() == [False, False, True]
+        assert arrays["id"].data.tolist() == [1, 2, 0]
+        assert arrays["name"].tolist() == ["a", None, "c"]
+        assert arrays["score"].mask.tolist() == [False, True, False]
+        assert arrays["active"].dtype == np.bool_
+        assert arrays["created_at"][0] == np.datetime64("2021-01-01")
+
+        empty_arrays = rows_to_columns([], ["id"], COLUMN_TYPES)
+
+        assert len(empty_arrays["id"]) == 0
+
+    def test_columns_to_dataframe(self):
+        """
+        test nulls become missing values
+        """
+
+        pd = pytest.importorskip("pandas")
+
+        arrays = rows_to_columns(BATCHES, list(COLUMN_TYPES.keys()), COLUMN_TYPES)
+        dataframe = columns_to_dataframe(arrays, COLUMN_TYPES)
+
+        assert list(dataframe.columns) == list(COLUMN_TYPES.keys())
+        assert str(dataframe["id"].dtype) == "Int64"
+        assert dataframe["id"].isna().tolist() == [False, False, True]
+        assert dataframe["score"].isna().tolist() == [False, True, False]
+        assert pd.isna(dataframe["created_at"][1])
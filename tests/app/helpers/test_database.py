@@ -0,0 +1,41 @@
+from kam.app.helpers.database import where_condition
+
+import pytest
+
+
+class TestDatabase:
+
+    def test_where_condition_values(self):
+        """
+        test values, nulls, lists and ranges are bound
+        """
+
+        assert where_condition("a.year", 2020) == ("a.year = %s", [2020])
+        assert where_condition("a.year", None) == ("a.year IS NULL", [])
+        assert where_condition("a.id", [1, 2]) == ("a.id = ANY(%s)", [[1, 2]])
+        assert where_condition("a.id", [1, None]) == ("(a.id = ANY(%s) OR a.id IS NULL)", [[1]])
+        assert where_condition("a.year", range(2020, 2023)) == ("(a.year >= %s AND a.year < %s)", [2020, 2023])
+
+    def test_where_condition_operators(self):
+        """
+        test operators are combined and negated
+        """
+
+        assert where_condition("a.year", dict(gte=2020, lt=2023)) == ("(a.year >= %s AND a.year < %s)", [2020, 2023])
+        assert where_condition("a.name", dict(like="data%")) == ("a.name LIKE %s", ["data%"])
+        assert where_condition("a.name", {"not": None}) == ("NOT (a.name IS NULL)", [])
+        assert where_condition("a.id", {"not": [1, 2]}) == ("NOT (a.id = ANY(%s))", [[1, 2]])
+
+    def test_where_condition_invalid(self):
+        """
+        test unknown operators and invalid operands are rejected
+        """
+
+        with pytest.raises(ValueError):
+            where_condition("a.year", dict(after=2020))
+
+        with pytest.raises(ValueError):
+            where_condition("a.year", dict(gt=None))
+
+        with pytest.raises(ValueError):
+            where_condition("a.year", range(2020, 2030, 2))
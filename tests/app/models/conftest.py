@@ -0,0 +1,257 @@
+
+import pytest
+
+from kam.app.models.active_record_schema import ActiveRecordSchema
+
+from contextlib import contextmanager
+
+
+def literal(value):
+    """
+    render a parameter like the database driver would
+    """
+
+    if value is None:
+        return "NULL"
+
+    if isinstance(value, str):
+        return f"'{value}'"
+
+    return str(value)
+
+
+class FakeCursor():
+
+    def __init__(self, connection, name=None, withhold=False):
+
+        self.connection = connection
+        self.name = name
+        self.withhold = withhold
+
+        self.results = []
+        self.description = None
+        self.rowcount = 0
+        self.itersize = 2000
+        self.closed = False
+
+    def mogrify(self, query, params=None):
+
+        if isinstance(query, bytes):
+            query = query.decode()
+
+        if params is not None:
+            query = query % tuple([literal(param) for param in params])
+
+        return query.encode()
+
+    def execute(self, query, params=None):
+
+        if isinstance(query, bytes):
+            query = query.decode()
+
+        self.connection.statements.append((query, params))
+
+        if self.connection.autocommit:
+            self.connection.autocommitted.append(query)
+
+        # queued result set of the statement
+        if len(self.connection.results) > 0:
+            columns, self.results = self.connection.results.pop(0)
+            self.description = [(column,) for column in columns]
+            self.rowcount = len(self.results)
+
+    def fetchall(self):
+
+        results, self.results = self.results, []
+
+        return results
+
+    def fetchone(self):
+
+        results, self.results = self.results[:1], self.results[1:]
+
+        return results[0] if len(results) > 0 else None
+
+    def fetchmany(self, size):
+
+        results, self.results = self.results[:size], self.results[size:]
+
+        return results
+
+    def copy_expert(self, query, file, size=8192):
+
+        self.connection.statements.append((query, None))
+
+        # stream the rest of the file
+        if "FROM STDIN" in query:
+            self.connection.copied = file.read()
+
+    def close(self):
+
+        self.closed = True
+
+
+class FakeConnection():
+
+    encoding = "UTF8"
+
+    def __init__(self, results=[]):
+
+        # result sets (columns, rows) returned by the next statements
+        self.results = list(results)
+
+        self.statements = []
+        self.cursors = []
+
+        # statements run outside of a transaction block
+        self.autocommit = False
+        self.autocommitted = []
+
+    def cursor(self, name=None, withhold=False):
+
+        cur = FakeCursor(self, name=name, withhold=withhold)
+        self.cursors.append(cur)
+
+        return cur
+
+    def commit(self):
+
+        self.statements.append(("COMMIT", None))
+
+    def rollback(self):
+
+        self.statements.append(("ROLLBACK", None))
+
+
+class FakeDatabase():
+    """
+    database recording the queries of the models
+    """
+
+    def __init__(self, select=None):
+
+        self.queries = []
+        self.next_id = 1
+
+        # returns the (columns, rows) of the selected records
+        self.select = select
+
+    def __next_ids(self, count):
+
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+
+        return ids
+
+    @contextmanager
+    def transaction(self):
+
+        yield self
+
+    def insert(self, table_name, table_schema, active_record, columns):
+
+        self.queries.append(("insert", table_name, columns))
+
+        active_record.id, = self.__next_ids(1)
+
+    def update(self, table_name, table_schema, id, columns):
+
+        self.queries.append(("update", table_name, id, columns))
+
+    def insert_all(self, table_name, table_schema, rows, returning_ids=True, batch_size=1000):
+
+        self.queries.append(("insert_all", table_name, rows))
+
+        return self.__next_ids(len(rows))
+
+    def update_all(self, table_name, table_schema, rows, batch_size=1000):
+
+        self.queries.append(("update_all", table_name, rows))
+
+    def select_tuples_where(self, model_table_name, table_schema, through=[], owner_key=False, **kwargs):
+
+        self.queries.append(dict(kwargs, model_table_name=model_table_name, through=through))
+
+        return self.select(model_table_name, through, **kwargs)
+
+
+@pytest.fixture
+def schema():
+    """
+    load tables in the schema, restoring the schema of other tests on teardown
+    """
+
+    db_schema = ActiveRecordSchema.db_schema
+    loaded = ActiveRecordSchema.loaded
+
+    ActiveRecordSchema.db_schema = {}
+
+    yield ActiveRecordSchema.load
+
+    ActiveRecordSchema.db_schema = db_schema
+    ActiveRecordSchema.loaded = loaded
+
+    # recompile the initializers of the models
+    ActiveRecordSchema.generation += 1
+
+
+@pytest.fixture
+def connect_models():
+    """
+    assign a database to models, restoring their database on teardown
+    """
+
+    # the lazy database of the models is not retrieved
+    connected = []
+
+    def connect(models, db):
+
+        for model in models:
+            connected.append((model, "db" in vars(model), vars(model).get("db")))
+            model.db = db
+
+    yield connect
+
+    for model, defined, db in reversed(connected):
+
+        if defined:
+            model.db = db
+        else:
+            del model.db
+
+
+@pytest.fixture
+def model_database(connect_models):
+    """
+    connect models to a database recording their queries
+    """
+
+    def connect(models=[], select=None):
+
+        db = FakeDatabase(select)
+        connect_models(models, db)
+
+        return db
+
+    return connect
+
+
+@pytest.fixture
+def fake_database(connect_models):
+    """
+    connect models to a database running its statements on a fake connection
+    """
+
+    # requires wagon_common
+    from kam.app.models.sql_database import SqlDatabase
+
+    def connect(results=[], models=[], **params):
+
+        db = SqlDatabase(dict(connection={}, prepared_statements=False, **params))
+        db.single_conn = FakeConnection(results)
+
+        connect_models(models, db)
+
+        return db
+
+    return connect
@@ -0,0 +1,128 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+from kam.app.models.active_record import ActiveRecord  # noqa: E402
+
+from datetime import datetime  # noqa: E402
+
+
+TABLES = dict(
+    change_assessments=dict(
+        columns=dict(id="integer", name="string", year="integer", timestamps=True),
+        constraints={},
+        indexes=[]),
+    custom_change_assessments=dict(
+        columns=dict(id="integer", name="string", year="integer", timestamps=True),
+        constraints={},
+        indexes=[]),
+    timestamped_assessments=dict(
+        columns=dict(id="integer", name="string", created_at="datetime", updated_at="datetime"),
+        constraints={},
+        indexes=[]))
+
+
+class ChangeAssessment(ActiveRecord):
+
+    pass
+
+
+class TimestampedAssessment(ActiveRecord):
+
+    pass
+
+
+class CustomChangeAssessment(ActiveRecord):
+
+    def __init__(self, **kwargs):
+
+        super().__init__(**kwargs)
+
+
+class TestChanges:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, schema, model_database):
+
+        schema(TABLES)
+
+        model_database([ChangeAssessment, CustomChangeAssessment])
+
+    def test_new_record(self):
+        """
+        test new records track the provided columns as changes
+        """
+
+        assessment = ChangeAssessment(name="data", year=2022)
+
+        assert assessment.changed == ["name", "year"]
+        assert assessment.changes == dict(name=(None, "data"), year=(None, 2022))
+
+        assessment.save()
+
+        assert assessment.changed == []
+        assert assessment.previous_changes == dict(id=(None, 1), name=(None, "data"), year=(None, 2022))
+
+    def test_constructed_record_with_id(self):
+        """
+        test records constructed with an id write their columns
+        """
+
+        assessment = ChangeAssessment(id=5, name="renamed")
+
+        assert assessment.changed == ["id", "name"]
+
+        assessment.save()
+
+        assert ChangeAssessment.db.queries == [
+            ("update", "change_assessments", 5, dict(name="renamed"))]
+
+    @pytest.mark.parametrize("klass", [ChangeAssessment, CustomChangeAssessment])
+    def test_loaded_record(self, klass):
+        """
+        test loaded records only write their changed columns
+        """
+
+        table_name = klass.table_name()
+        assessment, = klass.instantiate(("id", "name", "year"), [(5, "data", 2022)])
+
+        assert assessment.changed == []
+
+        # skip round trip
+        assessment.save()
+
+        assert ChangeAssessment.db.queries == []
+        assert assessment.previous_changes == {}
+
+        assessment.name = "renamed"
+
+        assert assessment.changes == dict(name=("data", "renamed"))
+
+        assessment.save()
+
+        assert ChangeAssessment.db.queries == [
+            ("update", table_name, 5, dict(name="renamed"))]
+        assert assessment.changed == []
+        assert assessment.previous_changes == dict(name=("data", "renamed"))
+
+    def test_changed_timestamps(self, fake_database):
+        """
+        test records whose timestamps only changed are not updated
+        """
+
+        db = fake_database(models=[TimestampedAssessment])
+
+        assessment, = TimestampedAssessment.instantiate(("id", "name"), [(5, "data")])
+
+        assessment.updated_at = datetime(2022, 1, 1)
+        assessment.save()
+
+        assert db.single_conn.statements == []
+
+        assessment.name = "renamed"
+        assessment.save()
+
+        assert db.single_conn.statements == [
+            ("UPDATE timestamped_assessments SET\n\"name\" = %s\nWHERE id = %s;", ["renamed", 5]),
+            ("COMMIT", None)]
@@ -0,0 +1,139 @@
+
+from kam.app.models.connection_pool import ConnectionPool
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+import threading
+
+import pytest
+
+
+class FakeConnection():
+
+    closed = 0
+
+    def get_transaction_status(self):
+
+        return TRANSACTION_STATUS_IDLE
+
+    def close(self):
+
+        self.closed = 1
+
+
+class TestConnectionPool:
+
+    def test_reuse(self):
+        """
+        test released connections are checked out again
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=2)
+
+        conn = pool.checkout()
+        pool.checkin(conn)
+
+        assert pool.checkout() is conn
+        assert pool.stats()["created"] == 1
+
+    def test_timeout(self):
+        """
+        test checkouts of a full pool time out
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=1, checkout_timeout=0.01)
+
+        pool.checkout()
+
+        with pytest.raises(TimeoutError):
+            pool.checkout()
+
+        assert pool.stats()["timeouts"] == 1
+
+    def test_reap(self):
+        """
+        test connections of ended threads are reclaimed
+        """
+
+        pool = ConnectionPool(FakeConnection, max_size=1, checkout_timeout=0.01)
+
+        thread = threading.Thread(target=pool.checkout)
+        thread.start()
+        thread.join()
+
+        assert pool.checkout() is not None
+        assert pool.stats()["closed"] == 1
+
+    def test_recycle(self):
+        """
+        test idle connections above the minimum size are closed
+        """
+
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=2, max_idle=0)
+
+        conns = [pool.checkout(), pool.checkout()]
+
+        for conn in conns:
+            pool.checkin(conn)
+
+        pool.checkout()
+
+        assert pool.stats()["closed"] == 1
+        assert pool.stats()["size"] == 1
+
+    def test_connect_outside_lock(self):
+        """
+        test connections are opened without holding the pool lock
+        """
+
+        pool = None
+        stats = []
+
+        def connect():
+
+            # another thread reads the stats while the connection is opened
+            thread = threading.Thread(target=lambda: stats.append(pool.stats()))
+            thread.start()
+            thread.join(1)
+
+            return FakeConnection()
+
+        pool = ConnectionPool(connect, max_size=1)
+
+        pool.checkout()
+
+        assert stats[0]["connecting"] == 1
+        assert stats[0]["size"] == 1
+        assert pool.stats()["connecting"] == 0
+
+    def test_connect_failure(self):
+        """
+        test slots reserved by failed connections are released
+        """
+
+        def connect():
+
+            raise ConnectionError("unreachable")
+
+        pool = ConnectionPool(connect, min_size=1, max_size=1)
+
+        with pytest.raises(ConnectionError):
+            pool.checkout()
+
+        with pytest.raises(ConnectionError):
+            pool.fill()
+
+        assert pool.stats()["size"] == 0
+        assert pool.stats()["created"] == 0
+
+    def test_fill(self):
+        """
+        test idle connections are opened up to the minimum size
+        """
+
+        pool = ConnectionPool(FakeConnection, min_size=2, max_size=3)
+
+        pool.fill()
+
+        assert pool.stats()["idle"] == 2
+        assert pool.stats()["created"] == 2
@@ -0,0 +1,124 @@
+
+from kam.app.models.model_initializer import (
+    build_initializer,
+    build_loader)
+
+
+TABLE_DEFINITION = dict(
+    columns=dict(
+        id="integer",
+        name="string",
+        assessment_id="integer",
+        timestamps=True),
+    constraints=dict(
+        assessment_id="assessments"))
+
+
+class Record():
+
+    pass
+
+
+class CompactRecord():
+
+    __slots__ = (
+        "id", "name", "assessment_id", "assessment",
+        "preloaded_relations", "original_attributes", "previous_changes")
+
+
+class TestModelInitializer:
+
+    def test_columns(self):
+        """
+        test columns are set and tracked as changes, including a provided id
+        """
+
+        initialize = build_initializer(TABLE_DEFINITION)
+
+        record = Record()
+        initialize(record, dict(id=1, name="skill"))
+
+        assert record.id == 1
+        assert record.name == "skill"
+        assert record.assessment_id is None
+        assert not hasattr(record, "timestamps")
+        assert record.original_attributes == dict(id=None, name=None, assessment_id=None)
+
+        new_record = Record()
+        initialize(new_record, dict(name="skill"))
+
+        assert new_record.original_attributes == dict(id=None, name=None, assessment_id=None)
+
+    def test_references(self):
+        """
+        test provided references set their id, including on compact records
+        """
+
+        initialize = build_initializer(TABLE_DEFINITION)
+
+        assessment = Record()
+        assessment.id = 3
+
+        record = CompactRecord()
+        initialize(record, dict(name="skill", assessment=assessment))
+
+        assert record.assessment is assessment
+        assert record.assessment_id == 3
+        assert record.preloaded_relations is None
+
+    def test_loader(self):
+        """
+        test loaded rows are set like initialized records, without calling __init__
+        """
+
+        class LoadedRecord(Record):
+
+            def __init__(self, **kwargs):
+
+                raise AssertionError("loaded records bypass __init__")
+
+        load = build_loader(LoadedRecord, TABLE_DEFINITION, ("id", "name", "created_at"))
+
+        records = load([(1, "skill", None), (2, "credit", None)])
+
+        assert [r.id for r in records] == [1, 2]
+        assert records[0].name == "skill"
+        assert records[0].assessment_id is None
+        assert records[0].previous_changes == {}
+        assert records[0].original_attributes == dict(id=1, name="skill", assessment_id=None)
+        assert not hasattr(records[0], "created_at")
+
+    def test_keyword_columns(self):
+        """
+        test columns which are python keywords or not identifiers are set through setattr
+        """
+
+        table_definition = dict(
+            columns={"id": "integer", "from": "string", "class": "string", "first name": "string"},
+            constraints={"class_id": "classes"})
+
+        initialize = build_initializer(table_definition)
+
+        record = Record()
+        initialize(record, {"from": "paris", "first name": "ada"})
+
+        assert getattr(record, "from") == "paris"
+        assert getattr(record, "first name") == "ada"
+        assert getattr(record, "class") is None
+
+        # references named after a keyword
+        klass = Record()
+        klass.id = 3
+
+        referencing_record = Record()
+        initialize(referencing_record, {"class": klass})
+
+        assert getattr(referencing_record, "class") is klass
+        assert referencing_record.class_id == 3
+
+        load = build_loader(Record, table_definition, ("id", "from", "class"))
+
+        loaded_record, = load([(1, "paris", "data")])
+
+        assert getattr(loaded_record, "class") == "data"
+        assert loaded_record.original_attributes == {"id": 1, "from": "paris", "class": "data", "first name": None}
@@ -0,0 +1,38 @@
+
+from kam.app.models.model_registry import ModelRegistry
+
+
+class SkillValidation():
+
+    pass
+
+
+class TestModelRegistry:
+
+    def test_register(self):
+        """
+        test model names are built once per klass
+        """
+
+        registry = ModelRegistry()
+
+        model = registry.register(SkillValidation)
+
+        assert model["table_name"] == "skill_validations"
+        assert model["table_ref"] == "skill_validation"
+        assert registry.model(SkillValidation) is model
+        assert registry.klass("skill_validations", __name__) is SkillValidation
+
+    def test_inflect(self):
+        """
+        test table names and references are inflected once
+        """
+
+        registry = ModelRegistry()
+
+        assert registry.inflect("skills") == ("skill", "skills", True)
+        assert registry.inflect("assessment") == ("assessment", "assessments", False)
+        assert registry.table_ref("skills") == "skill"
+        assert registry.table_name("assessment") == "assessments"
+
+        assert set(registry.names.keys()) == {"skills", "assessment"}
@@ -0,0 +1,81 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+from kam.app.models.active_record import ActiveRecord  # noqa: E402
+from kam.app.models.query_counter import NPlusOneWarning  # noqa: E402
+
+import kam  # noqa: E402
+
+import warnings  # noqa: E402
+
+
+TABLES = dict(
+    detected_assessments=dict(
+        columns=dict(id="integer", name="string", timestamps=True),
+        constraints={},
+        indexes=[]),
+    detected_skills=dict(
+        columns=dict(id="integer", name="string", detected_assessment_id="integer", timestamps=True),
+        constraints=dict(detected_assessment_id="detected_assessments"),
+        indexes=[]))
+
+
+SKILLS = (("id", "name", "detected_assessment_id"), [(1, "sql", 1)])
+
+
+class DetectedAssessment(ActiveRecord):
+
+    @classmethod
+    def relations(cls):
+
+        cls.has_many("detected_skills")
+
+
+class DetectedSkill(ActiveRecord):
+
+    pass
+
+
+class TestNPlusOne:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, schema, fake_database):
+
+        schema(TABLES)
+
+        # skills of each queried relation
+        fake_database([SKILLS] * 3, models=[DetectedAssessment, DetectedSkill])
+
+    def test_relation_loop(self):
+        """
+        test relations queried for each record of a loop suggest eager loading them
+        """
+
+        assessments = [DetectedAssessment(id=i, name="data") for i in range(3)]
+
+        with pytest.warns(NPlusOneWarning, match=r'DetectedAssessment.includes\("detected_skills"\)') as record:
+            with kam.detect_n_plus_one():
+                for assessment in assessments:
+                    list(assessment.detected_skills())
+
+        # reported at the line of the loop
+        assert len(record) == 1
+        assert record[0].filename == __file__
+
+    def test_relation_distinct_lines(self):
+        """
+        test relations queried once per line are not reported
+        """
+
+        assessment = DetectedAssessment(id=1, name="data")
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", NPlusOneWarning)
+
+            with kam.detect_n_plus_one() as detector:
+                list(assessment.detected_skills())
+                list(assessment.detected_skills())
+
+        assert sorted(detector.repetitions.values()) == [1, 1]
@@ -0,0 +1,57 @@
+
+from kam.app.models.notifications import Notifications
+
+import pytest
+
+
+class TestNotifications:
+
+    def test_subscribe(self):
+        """
+        test subscribers are notified until unsubscribed
+        """
+
+        notifications = Notifications()
+        events = []
+
+        subscriber = notifications.subscribe("sql.kam", events.append)
+        notifications.publish("sql.kam", dict(sql="SELECT 1;"))
+        notifications.unsubscribe(subscriber)
+        notifications.publish("sql.kam", dict(sql="SELECT 2;"))
+
+        assert events == [dict(sql="SELECT 1;")]
+        assert not notifications.subscribed("sql.kam")
+
+    def test_instrument(self):
+        """
+        test instrumented blocks publish their duration and payload
+        """
+
+        notifications = Notifications()
+        events = []
+
+        with notifications.subscription("sql.kam", events.append):
+            with notifications.instrument("sql.kam", dict(sql="SELECT 1;")) as event:
+                event["row_count"] = 1
+
+        assert len(events) == 1
+        assert events[0]["sql"] == "SELECT 1;"
+        assert events[0]["row_count"] == 1
+        assert events[0]["duration"] >= 0
+        assert "exception" not in events[0]
+
+    def test_instrument_exception(self):
+        """
+        test instrumented blocks publish their exception
+        """
+
+        notifications = Notifications()
+        events = []
+
+        with notifications.subscription("sql.kam", events.append):
+            with pytest.raises(ValueError):
+                with notifications.instrument("sql.kam", dict(sql="SELECT 1;")):
+                    raise ValueError("invalid")
+
+        assert isinstance(events[0]["exception"], ValueError)
+        assert "duration" in events[0]
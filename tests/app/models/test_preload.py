@@ -0,0 +1,126 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+from kam.app.models.active_record import ActiveRecord  # noqa: E402
+
+
+TABLES = dict(
+    preload_assessments=dict(
+        columns=dict(id="integer", name="string", timestamps=True),
+        constraints={},
+        indexes=[]),
+    preload_skills=dict(
+        columns=dict(id="integer", name="string", preload_assessment_id="integer", timestamps=True),
+        constraints=dict(preload_assessment_id="preload_assessments"),
+        indexes=[]))
+
+ASSESSMENTS = [(1, "data"), (2, "web"), (3, "empty")]
+
+SKILLS = [(10, "sql", 1), (11, "pandas", 1), (12, "html", 2)]
+
+
+def select(model_table_name, through, **kwargs):
+    """
+    return the records of the model, along with the id of their owner when preloaded
+    """
+
+    # records of the model
+    if len(through) == 0:
+
+        if model_table_name == "preload_assessments":
+            return ("id", "name"), ASSESSMENTS
+
+        return ("id", "name", "preload_assessment_id"), SKILLS
+
+    owner_ids = kwargs["id"]
+
+    # skills of the assessments along with the id of their assessment
+    if through == ["preload_skills"]:
+
+        rows = [skill + (skill[2],) for skill in SKILLS if skill[2] in owner_ids]
+
+        return ("id", "name", "preload_assessment_id", "kam_owner_id"), rows
+
+    # assessment of the skills along with the id of their skill
+    assessments = {assessment[0]: assessment for assessment in ASSESSMENTS}
+    rows = [assessments[skill[2]] + (skill[0],) for skill in SKILLS if skill[0] in owner_ids]
+
+    return ("id", "name", "kam_owner_id"), rows
+
+
+class PreloadAssessment(ActiveRecord):
+
+    @classmethod
+    def relations(cls):
+
+        cls.has_many("preload_skills")
+
+
+class PreloadSkill(ActiveRecord):
+
+    # relations declared by the first record
+    def __init__(self, **kwargs):
+
+        super().__init__(**kwargs)
+
+        self.belongs_to("preload_assessment")
+
+
+class TestPreload:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, schema, model_database):
+
+        schema(TABLES)
+
+        model_database([PreloadAssessment, PreloadSkill], select=select)
+
+    def test_has_many(self):
+        """
+        test loaded records are grouped by owner, referencing their owner
+        """
+
+        assessments = list(PreloadAssessment.all().includes("preload_skills"))
+
+        # a single query per relation
+        queries = PreloadAssessment.db.queries
+
+        assert len(queries) == 2
+        assert sorted(queries[1]["id"]) == [1, 2, 3]
+
+        # records grouped by owner
+        assert [[s.id for s in a.preload_skills()] for a in assessments] == [[10, 11], [12], []]
+
+        # owner reference
+        skill = assessments[0].preload_skills()[0]
+
+        assert skill.preload_assessment is assessments[0]
+
+    def test_belongs_to(self):
+        """
+        test records referencing the same row share the loaded instance
+        """
+
+        skills = list(PreloadSkill.all().includes("preload_assessment"))
+
+        assessments = [skill.preload_assessment()[0] for skill in skills]
+
+        assert [a.id for a in assessments] == [1, 1, 2]
+        assert assessments[0] is assessments[1]
+
+    def test_preloaded_relations(self):
+        """
+        test preloaded relations are returned by the relation method without querying
+        """
+
+        assessment = list(PreloadAssessment.all().includes("preload_skills"))[0]
+
+        query_count = len(PreloadAssessment.db.queries)
+
+        relation = assessment.preload_skills()
+
+        assert relation is assessment.preloaded_relations["preload_skills"]
+        assert len(relation) == 2
+        assert len(PreloadAssessment.db.queries) == query_count
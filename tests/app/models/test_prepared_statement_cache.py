@@ -0,0 +1,52 @@
+
+from kam.app.models.prepared_statement_cache import PreparedStatementCache
+
+
+class FakeCursor():
+
+    def __init__(self):
+
+        self.queries = []
+
+    def execute(self, query, params=None):
+
+        self.queries.append((query, params))
+
+
+class TestPreparedStatementCache:
+
+    def test_prepare_once(self):
+        """
+        test statements are prepared on miss and executed on hit
+        """
+
+        cur = FakeCursor()
+        cache = PreparedStatementCache()
+
+        query = "SELECT * FROM tests WHERE id = %s AND name = %s;"
+
+        cache.execute(cur, ("select", query), query, [1, "a"])
+        cache.execute(cur, ("select", query), query, [2, "b"])
+
+        assert cur.queries == [
+            ("PREPARE kam_statement_1 AS SELECT * FROM tests WHERE id = $1 AND name = $2;", None),
+            ("EXECUTE kam_statement_1 (%s, %s);", [1, "a"]),
+            ("EXECUTE kam_statement_1 (%s, %s);", [2, "b"])]
+
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_eviction(self):
+        """
+        test least recently used statements are deallocated
+        """
+
+        cur = FakeCursor()
+        cache = PreparedStatementCache(max_size=2)
+
+        for key in ["a", "b", "a", "c"]:
+            cache.execute(cur, key, f"SELECT '{key}';")
+
+        assert ("DEALLOCATE kam_statement_2;", None) in cur.queries
+        assert list(cache.statements.keys()) == ["a", "c"]
+        assert cache.stats()["evictions"] == 1
@@ -0,0 +1,66 @@
+
+from kam.app.models.notifications import (
+    NOTIFICATIONS,
+    SQL_EVENT)
+
+from kam.app.models.query_counter import NPlusOneWarning
+
+import kam
+
+import pytest
+
+
+def query(sql="SELECT a.*\nFROM skills a\nWHERE\na.\"assessment_id\" = %s;"):
+
+    with NOTIFICATIONS.instrument(SQL_EVENT, dict(sql=sql, table_name="skills")):
+        pass
+
+
+class TestQueryCounter:
+
+    def test_assert_queries(self):
+        """
+        test blocks running at most max queries pass
+        """
+
+        with kam.assert_queries(max=2) as counter:
+            query()
+            query()
+
+        assert len(counter) == 2
+
+    def test_assert_queries_exceeded(self):
+        """
+        test blocks running more than max queries fail
+        """
+
+        with pytest.raises(AssertionError):
+            with kam.assert_queries(max=1):
+                query()
+                query()
+
+    def test_detect_n_plus_one(self):
+        """
+        test queries repeated from the same line suggest eager loading their relation
+        """
+
+        with pytest.warns(NPlusOneWarning, match=r'Assessment.includes\("skills"\)'):
+            with kam.detect_n_plus_one():
+                with NOTIFICATIONS.context(association="skills", owner="Assessment"):
+                    for _ in range(3):
+                        query()
+
+    def test_detect_n_plus_one_distinct_lines(self):
+        """
+        test queries run once per line are not reported
+        """
+
+        payload = dict(sql="SELECT a.*\nFROM skills a;", table_name="skills")
+
+        with kam.detect_n_plus_one() as detector:
+            with NOTIFICATIONS.instrument(SQL_EVENT, payload):
+                pass
+            with NOTIFICATIONS.instrument(SQL_EVENT, payload):
+                pass
+
+        assert sorted(detector.repetitions.values()) == [1, 1]
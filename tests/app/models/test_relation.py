@@ -0,0 +1,167 @@
+
+from kam.app.models.relation import Relation
+
+
+class FakeDatabase():
+
+    def __init__(self, rows):
+
+        self.rows = rows
+        self.queries = []
+
+    def select_tuples_where(self, model_table_name, table_schema, through=[], **kwargs):
+
+        self.queries.append(dict(kwargs, through=through))
+
+        # apply window
+        offset = kwargs.get("offset") or 0
+        limit = kwargs.get("limit")
+        rows = self.rows[offset:]
+        rows = rows if limit is None else rows[:limit]
+
+        return ("id",), [(row["id"],) for row in rows]
+
+    def aggregate_where(self, model_table_name, table_schema, aggregate, group=[], through=[], **kwargs):
+
+        self.queries.append(dict(kwargs, aggregate=aggregate, group=group, through=through))
+
+        # count rows by group values
+        if len(group) > 0:
+            return [tuple([row[column] % 2 for column in group]) + (len(self.rows) // 2,) for row in self.rows[:2]]
+
+        return None if aggregate[0] == "sum" else len(self.rows)
+
+    def pluck_where(self, model_table_name, table_schema, columns, through=[], **kwargs):
+
+        self.queries.append(dict(kwargs, columns=columns, through=through))
+
+        return [tuple([row[column] for column in columns]) for row in self.rows]
+
+
+class FakeModel():
+
+    db = None
+
+    def __init__(self, **kwargs):
+
+        self.id = kwargs.get("id")
+
+    @classmethod
+    def instantiate(cls, columns, rows):
+
+        return [cls(**dict(zip(columns, row))) for row in rows]
+
+    @classmethod
+    def table_name(cls):
+
+        return "fake_models"
+
+    @classmethod
+    def table_schema(cls):
+
+        return dict(id="integer")
+
+
+class TestRelation:
+
+    def setup_method(self):
+
+        FakeModel.db = FakeDatabase([dict(id=i) for i in range(10)])
+
+    def test_lazy(self):
+        """
+        test relation runs its query once, on first access
+        """
+
+        relation = Relation(FakeModel).where(id=3).order(id="desc").limit(5)
+
+        assert len(FakeModel.db.queries) == 0
+
+        assert len(relation) == 5
+        assert [r.id for r in relation] == [0, 1, 2, 3, 4]
+        assert len(FakeModel.db.queries) == 1
+
+        query = FakeModel.db.queries[0]
+        assert query["target_conditions"] == dict(id=3)
+        assert query["order"] == [("id", "desc")]
+        assert query["limit"] == 5
+
+    def test_slice(self):
+        """
+        test slices and indexes of unloaded relations query a window
+        """
+
+        relation = Relation(FakeModel).offset(2).limit(5)
+
+        assert [r.id for r in relation[1:3]] == [3, 4]
+        assert FakeModel.db.queries[-1]["offset"] == 3
+        assert FakeModel.db.queries[-1]["limit"] == 2
+
+        assert relation[4].id == 6
+        assert relation[10:20] == []
+        assert relation.records is None
+
+    def test_spawn(self):
+        """
+        test chained calls do not alter the original relation
+        """
+
+        relation = Relation(FakeModel)
+        relation.where(id=1).limit(1)
+
+        assert relation.target_conditions == {}
+        assert relation.limit_value is None
+
+    def test_pluck(self):
+        """
+        test pluck returns tuples, or values for a single column
+        """
+
+        relation = Relation(FakeModel).select("id")
+
+        assert relation.pluck("id")[:3] == [0, 1, 2]
+        assert relation.pluck("id", "id")[1] == (1, 1)
+        assert FakeModel.db.queries[-1]["columns"] == ["id", "id"]
+
+        # loaded relations do not query
+        relation.load()
+        assert FakeModel.db.queries[-1]["columns"] == ["id"]
+        assert relation.pluck("id")[:3] == [0, 1, 2]
+        assert len(FakeModel.db.queries) == 3
+
+    def test_aggregate(self):
+        """
+        test aggregates are computed by the database, by group values if grouped
+        """
+
+        relation = Relation(FakeModel)
+
+        assert relation.count() == 10
+        assert relation.sum("id") == 0
+        assert FakeModel.db.queries[-1]["aggregate"] == ("sum", "id")
+
+        assert relation.group("id").count() == {0: 5, 1: 5}
+        assert relation.group("id", "id").count() == {(0, 0): 5, (1, 1): 5}
+
+        # loaded relations count their records
+        relation.load()
+        assert relation.count() == 10
+        assert len(FakeModel.db.queries) == 5
+
+    def test_select_id(self):
+        """
+        test records of projections retrieve their id, unlike plucked values
+        """
+
+        FakeModel.db = FakeDatabase([dict(id=i, name=f"skill {i}") for i in range(10)])
+
+        relation = Relation(FakeModel).select("name")
+
+        relation.pluck("name")
+        assert FakeModel.db.queries[-1]["columns"] == ["name"]
+
+        relation.select("id").load()
+        assert FakeModel.db.queries[-1]["columns"] == ["name", "id"]
+
+        relation.load()
+        assert FakeModel.db.queries[-1]["columns"] == ["id", "name"]
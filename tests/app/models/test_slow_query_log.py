@@ -0,0 +1,70 @@
+
+from kam.app.models.slow_query_log import SlowQueryLog
+
+import json
+
+
+def event(duration, operation="select", **kwargs):
+
+    return dict(
+        sql="SELECT a.*\nFROM assessments a\nWHERE\na.\"year\" = %s;",
+        params=[2020],
+        operation=operation,
+        table_name="assessments",
+        model="Assessment",
+        duration=duration,
+        **kwargs)
+
+
+class TestSlowQueryLog:
+
+    def test_is_slow(self, tmp_path):
+        """
+        test queries are slow from the threshold in milliseconds
+        """
+
+        slow_query_log = SlowQueryLog(str(tmp_path / "slow.log"), threshold=100)
+
+        assert slow_query_log.is_slow(event(0.1))
+        assert not slow_query_log.is_slow(event(0.099))
+
+    def test_is_explainable(self, tmp_path):
+        """
+        test only successful reads and writes of a single statement are explained
+        """
+
+        slow_query_log = SlowQueryLog(str(tmp_path / "explain.log"), explain=True)
+
+        assert slow_query_log.is_explainable(event(1))
+        assert not slow_query_log.is_explainable(event(1, operation="insert_all"))
+        assert not slow_query_log.is_explainable(event(1, exception=ValueError()))
+
+    def test_is_analyzable(self, tmp_path):
+        """
+        test only reads run again through explain analyze
+        """
+
+        slow_query_log = SlowQueryLog(str(tmp_path / "analyze.log"), explain=True)
+
+        assert slow_query_log.is_analyzable(event(1))
+        assert slow_query_log.is_explainable(event(1, operation="update"))
+        assert not slow_query_log.is_analyzable(event(1, operation="update"))
+        assert not slow_query_log.is_analyzable(event(1, operation="destroy_all"))
+
+    def test_record(self, tmp_path):
+        """
+        test slow queries are written along with their call site
+        """
+
+        path = tmp_path / "record.log"
+        slow_query_log = SlowQueryLog(str(path), threshold=0)
+
+        slow_query_log.record(event(0.25), plan="Seq Scan on assessments")
+
+        record = json.loads(path.read_text().splitlines()[0])
+
+        assert record["duration"] == 250
+        assert record["params"] == [2020]
+        assert record["model"] == "Assessment"
+        assert record["plan"] == "Seq Scan on assessments"
+        assert __file__ in record["call_site"]
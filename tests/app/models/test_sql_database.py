@@ -0,0 +1,452 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+import io  # noqa: E402
+import re  # noqa: E402
+
+from kam.app.models.sql_database import SqlDatabase  # noqa: E402
+from kam.app.models.active_record import ActiveRecord  # noqa: E402
+from kam.app.models.relation import Relation  # noqa: E402
+
+
+TABLE_SCHEMA = dict(id="integer", name="string", year="integer", timestamps=True)
+
+
+class BatchModel():
+
+    db = None
+
+    def __init__(self, id, name):
+
+        self.id = id
+        self.name = name
+
+    @classmethod
+    def instantiate(cls, columns, rows):
+
+        return [cls(**dict(zip(columns, row))) for row in rows]
+
+    @classmethod
+    def table_name(cls):
+
+        return "assessments"
+
+    @classmethod
+    def table_schema(cls):
+
+        return TABLE_SCHEMA
+
+
+ROWS = [(i, f"assessment {i}") for i in range(5)]
+
+
+class InsertedAssessment(ActiveRecord):
+
+    pass
+
+
+class TestUpsertAll:
+
+    def setup_method(self):
+
+        self.db = SqlDatabase(dict(connection={}))
+
+    def test_update_columns(self):
+        """
+        test update columns are validated against the inserted columns
+        """
+
+        with pytest.raises(ValueError, match="Invalid update column year"):
+            self.db.upsert_all(
+                "assessments", TABLE_SCHEMA, [dict(name="data")], ["name"], update_columns=["year"])
+
+    def test_new_rows_unique_by_id(self):
+        """
+        test rows without id cannot be upserted on their id
+        """
+
+        rows = [dict(id=1, name="data"), dict(id=None, name="sql")]
+
+        with pytest.raises(ValueError, match="Invalid upsert on id"):
+            self.db.upsert_all("assessments", TABLE_SCHEMA, rows, ["id"])
+
+    def test_null_unique_values(self, fake_database):
+        """
+        test rows with a null unique value are all inserted, other rows are deduplicated
+        """
+
+        rows = [
+            dict(name=None, year=2020),
+            dict(name="data", year=2021),
+            dict(name=None, year=2022),
+            dict(name="data", year=2023)]
+
+        db = fake_database([(("name", "id"), [("data", 7), (None, 8), (None, 9)])])
+
+        ids = db.upsert_all("assessments", TABLE_SCHEMA, rows, ["name"])
+
+        query, _ = db.single_conn.statements[0]
+
+        assert "VALUES ('data',2023),(NULL,2020),(NULL,2022)" in query
+        assert ids == [8, 7, 9, 7]
+
+
+class TestSelect:
+
+    def setup_method(self):
+
+        self.db = SqlDatabase(dict(connection={}))
+
+    def test_order_columns(self):
+        """
+        test order columns are validated against the target schema
+        """
+
+        with pytest.raises(ValueError, match="Invalid column name; DROP TABLE assessments"):
+            self.db.select_tuples_where(
+                "assessments", TABLE_SCHEMA, order=[("name; DROP TABLE assessments", "asc")])
+
+        with pytest.raises(ValueError, match="Invalid column level"):
+            self.db.select_tuples_where("assessments", TABLE_SCHEMA, order=[("level", "desc")])
+
+
+class TestExplain:
+
+    def test_explain_writes(self, tmp_path, fake_database):
+        """
+        test slow reads run again through explain analyze while writes are only planned
+        """
+
+        slow_query_log = dict(path=str(tmp_path / "slow.log"), threshold=0, explain=True)
+
+        db = fake_database(slow_query_log=slow_query_log)
+        db.update("assessments", TABLE_SCHEMA, 1, dict(name="data"))
+
+        explains = [query for query, _ in db.single_conn.statements if query.startswith("EXPLAIN")]
+
+        assert explains == ["EXPLAIN UPDATE assessments SET\n\"name\" = %s\nWHERE id = %s;"]
+
+        db = fake_database(slow_query_log=slow_query_log)
+        db.pluck_where("assessments", TABLE_SCHEMA, ["name"])
+
+        explains = [query for query, _ in db.single_conn.statements if query.startswith("EXPLAIN")]
+
+        assert explains[0].startswith("EXPLAIN (ANALYZE, BUFFERS) SELECT")
+
+
+class TestSelectInBatches:
+
+    def test_batches(self, fake_database):
+        """
+        test rows are fetched in batches from a held server side cursor, closed once consumed
+        """
+
+        db = fake_database([(("id", "name"), ROWS)])
+
+        batches = list(db.select_in_batches("assessments", TABLE_SCHEMA, batch_size=2))
+
+        assert [len(rows) for _, rows in batches] == [2, 2, 1]
+        assert batches[0][0] == ("id", "name")
+        assert batches[2][1] == [ROWS[4]]
+
+        cur = db.single_conn.cursors[0]
+
+        assert cur.name.startswith("kam_batches_")
+        assert cur.withhold
+        assert cur.itersize == 2
+        assert cur.closed
+
+    def test_early_stop(self, fake_database):
+        """
+        test the cursor is closed when the consumer stops early
+        """
+
+        db = fake_database([(("id", "name"), ROWS)])
+
+        batches = db.select_in_batches("assessments", TABLE_SCHEMA, batch_size=2)
+        next(batches)
+
+        cur = db.single_conn.cursors[0]
+
+        assert not cur.closed
+
+        batches.close()
+
+        assert cur.closed
+
+    def test_find_each(self, fake_database):
+        """
+        test relations stream model instances batch by batch
+        """
+
+        fake_database([(("id", "name"), ROWS)], models=[BatchModel])
+
+        relation = Relation(BatchModel)
+
+        assert [len(records) for records in relation.find_in_batches(batch_size=3)] == [3, 2]
+
+        fake_database([(("id", "name"), ROWS)], models=[BatchModel])
+
+        records = relation.find_each(batch_size=2)
+
+        assert next(records).name == "assessment 0"
+
+        records.close()
+
+        assert BatchModel.db.single_conn.cursors[0].closed
+        assert relation.records is None
+
+
+class TestInsertAll:
+
+    def test_batches(self, fake_database):
+        """
+        test rows are inserted by multi row batches returning their ids
+        """
+
+        rows = [dict(name="data", year=2021), dict(name="web"), dict(year=2023)]
+
+        db = fake_database([(("id",), [(1,), (2,)]), (("id",), [(3,)])])
+
+        ids = db.insert_all("assessments", TABLE_SCHEMA, rows, batch_size=2)
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries == [
+            "INSERT INTO assessments (\"name\", \"year\")\nVALUES ('data',2021),('web',NULL)\nRETURNING id;",
+            "INSERT INTO assessments (\"name\", \"year\")\nVALUES (NULL,2023)\nRETURNING id;",
+            "COMMIT"]
+        assert ids == [1, 2, 3]
+
+    def test_invalid_column(self, fake_database):
+        """
+        test columns missing from the schema are rejected
+        """
+
+        with pytest.raises(ValueError, match="Invalid column level"):
+            fake_database().insert_all("assessments", TABLE_SCHEMA, [dict(level=1)])
+
+    def test_model_ids(self, schema, fake_database):
+        """
+        test inserted ids are set on the model instances, along with their applied changes
+        """
+
+        schema(dict(inserted_assessments=dict(columns=TABLE_SCHEMA, constraints={}, indexes=[])))
+
+        fake_database([(("id",), [(7,), (8,)])], models=[InsertedAssessment])
+
+        assessment = InsertedAssessment(name="data", year=2022)
+
+        ids = InsertedAssessment.insert_all([assessment, dict(name="web")])
+
+        assert ids == [7, 8]
+        assert assessment.id == 7
+        assert assessment.changed == []
+        assert assessment.previous_changes["name"] == (None, "data")
+
+
+class TestCopy:
+
+    def test_header_columns(self, fake_database):
+        """
+        test header columns are validated against the table schema
+        """
+
+        file = io.StringIO("name,level\ndata,1\n")
+
+        with pytest.raises(ValueError, match="Invalid column level for table assessments"):
+            fake_database().copy_from("assessments", TABLE_SCHEMA, file)
+
+    def test_copy_from(self, fake_database):
+        """
+        test csv files load quoted empty values of non string columns as NULL and resync the id sequence
+        """
+
+        file = io.StringIO("id,name,year\n1,data,\"\"\n")
+
+        db = fake_database()
+        db.copy_from("assessments", TABLE_SCHEMA, file)
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries == [
+            "COPY assessments (\"id\", \"name\", \"year\")\nFROM STDIN"
+            + "\nWITH (FORMAT csv, DELIMITER E',', FORCE_NULL (\"id\", \"year\"));",
+            "SELECT setval(pg_get_serial_sequence('assessments', 'id'), COALESCE(MAX(id), 1)) FROM assessments;",
+            "COMMIT"]
+        assert db.single_conn.copied == "1,data,\"\"\n"
+
+    def test_copy_from_tsv(self, fake_database):
+        """
+        test tsv files are loaded through the text format, without sequence resync when ids are generated
+        """
+
+        file = io.StringIO("name\tyear\n\"data\t2022\n")
+
+        db = fake_database()
+        db.copy_from("assessments", TABLE_SCHEMA, file, file_format="tsv")
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries == [
+            "COPY assessments (\"name\", \"year\")\nFROM STDIN\nWITH (FORMAT text, NULL '');",
+            "COMMIT"]
+
+    def test_copy_to_tsv(self, fake_database):
+        """
+        test tsv files are written with a header row
+        """
+
+        file = io.StringIO()
+
+        db = fake_database([(("id", "name"), [])])
+        db.copy_to("assessments", file, file_format="tsv")
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries == [
+            "SELECT * FROM (SELECT * FROM assessments) kam_header LIMIT 0;",
+            "COPY assessments\nTO STDOUT\nWITH (FORMAT text, NULL '');"]
+        assert file.getvalue() == "id\tname\n"
+
+
+class TestIndexes:
+
+    def test_add_index(self, fake_database):
+        """
+        test indexes are named after their columns, partial unique indexes keep their predicate
+        """
+
+        db = fake_database()
+
+        db.add_index("assessments", ["name", "year"])
+        db.add_index("assessments", ["name"], unique=True, name="index_named", where="year > 2020")
+
+        assert db.single_conn.statements == [
+            ("CREATE INDEX index_assessments_on_name_and_year\nON assessments (\"name\", \"year\");", None),
+            ("COMMIT", None),
+            ("CREATE UNIQUE INDEX index_named\nON assessments (\"name\")\nWHERE year > 2020;", None),
+            ("COMMIT", None)]
+
+    def test_concurrently(self, fake_database):
+        """
+        test concurrent indexes commit the running transaction and run outside of a transaction block
+        """
+
+        db = fake_database()
+
+        db.add_index("assessments", ["name"], concurrently=True)
+        db.remove_index("assessments", ["name"], concurrently=True)
+
+        assert db.single_conn.statements == [
+            ("COMMIT", None),
+            ("CREATE INDEX CONCURRENTLY index_assessments_on_name\nON assessments (\"name\");", None),
+            ("COMMIT", None),
+            ("DROP INDEX CONCURRENTLY index_assessments_on_name;", None)]
+        assert db.single_conn.autocommitted == [
+            "CREATE INDEX CONCURRENTLY index_assessments_on_name\nON assessments (\"name\");",
+            "DROP INDEX CONCURRENTLY index_assessments_on_name;"]
+        assert not db.single_conn.autocommit
+
+    def test_concurrently_within_transaction(self, fake_database):
+        """
+        test concurrent indexes are rejected within a transaction
+        """
+
+        db = fake_database()
+
+        with pytest.raises(ValueError, match="Concurrent index operations"):
+            with db.transaction():
+                db.add_index("assessments", ["name"], concurrently=True)
+
+    def test_remove_index(self, fake_database):
+        """
+        test indexes are removed by name or columns
+        """
+
+        db = fake_database()
+
+        db.remove_index("assessments", name="index_named")
+
+        assert db.single_conn.statements[0] == ("DROP INDEX index_named;", None)
+
+        with pytest.raises(ValueError, match="Missing index columns or name"):
+            db.remove_index("assessments")
+
+    def test_reference_indexes(self, fake_database):
+        """
+        test created tables index their references
+        """
+
+        db = fake_database()
+
+        db.create_table("skills", dict(name="string", assessment="references"))
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries[0].startswith("CREATE TABLE \"skills\" (")
+        assert "\"assessment_id\" BIGINT NOT NULL" in queries[0]
+        assert queries[-2:] == [
+            "CREATE INDEX index_skills_on_assessment_id\nON skills (\"assessment_id\");",
+            "COMMIT"]
+
+
+class TestChangeReference:
+
+    def test_serial_reference(self, fake_database):
+        """
+        test references created as serial columns drop their sequence and recreate their foreign keys
+        """
+
+        db = fake_database([
+            (("pg_get_serial_sequence",), [("public.skills_assessment_id_seq",)]),
+            (("conname",), [("fk_kam_old",), ("fk_kam_duplicate",)])])
+
+        db.change_reference("skills", "assessment", null=True, on_delete="cascade")
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert db.single_conn.statements[0][1] == ["skills", "assessment_id"]
+        assert queries[2:7] == [
+            "ALTER TABLE skills ALTER COLUMN \"assessment_id\" DROP DEFAULT;",
+            "DROP SEQUENCE public.skills_assessment_id_seq;",
+            "ALTER TABLE skills ALTER COLUMN \"assessment_id\" DROP NOT NULL;",
+            "ALTER TABLE skills DROP CONSTRAINT fk_kam_old;",
+            "ALTER TABLE skills DROP CONSTRAINT fk_kam_duplicate;"]
+        assert re.fullmatch(
+            "ALTER TABLE skills ADD CONSTRAINT fk_kam_[0-9a-f]{32} FOREIGN KEY \\(\"assessment_id\"\\) "
+            + "REFERENCES public.assessments\\(id\\) ON DELETE CASCADE;",
+            queries[7])
+
+        # single transaction
+        assert queries[8:] == ["COMMIT"]
+
+    def test_plain_reference(self, fake_database):
+        """
+        test references without sequence nor foreign key only change their nullability and add their foreign key
+        """
+
+        db = fake_database([(("pg_get_serial_sequence",), [(None,)]), (("conname",), [])])
+
+        db.change_reference("skills", "assessment")
+
+        queries = [query for query, _ in db.single_conn.statements]
+
+        assert queries[2] == "ALTER TABLE skills ALTER COLUMN \"assessment_id\" SET NOT NULL;"
+        assert queries[3].startswith("ALTER TABLE skills ADD CONSTRAINT fk_kam_")
+        assert not queries[3].endswith("ON DELETE CASCADE;")
+        assert queries[4:] == ["COMMIT"]
+
+    def test_invalid_on_delete(self, fake_database):
+        """
+        test unsupported on delete actions are rejected before altering the table
+        """
+
+        db = fake_database()
+
+        with pytest.raises(ValueError):
+            db.change_reference("skills", "assessment", on_delete="explode")
+
+        assert db.single_conn.statements == []
@@ -0,0 +1,103 @@
+
+import pytest
+
+pytest.importorskip("wagon_common")
+
+from kam.app.models.active_record import ActiveRecord  # noqa: E402
+
+
+TABLES = dict(
+    unit_assessments=dict(
+        columns=dict(id="integer", name="string", timestamps=True),
+        constraints={},
+        indexes=[]),
+    unit_skills=dict(
+        columns=dict(id="integer", name="string", unit_assessment_id="integer", timestamps=True),
+        constraints=dict(unit_assessment_id="unit_assessments"),
+        indexes=[]))
+
+
+class UnitAssessment(ActiveRecord):
+
+    pass
+
+
+class UnitSkill(ActiveRecord):
+
+    pass
+
+
+class TestUnitOfWork:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, schema, model_database):
+
+        schema(TABLES)
+
+        model_database([UnitAssessment, UnitSkill])
+
+    def test_flush_order(self):
+        """
+        test referenced tables are flushed first, filling the references of the records
+        """
+
+        assessment = UnitAssessment(name="data")
+        skill = UnitSkill(name="sql", unit_assessment=assessment)
+
+        with UnitAssessment.transaction(unit_of_work=True):
+            skill.save()
+            assessment.save()
+
+        queries = UnitAssessment.db.queries
+
+        assert [(q[0], q[1]) for q in queries] == [
+            ("insert_all", "unit_assessments"),
+            ("insert_all", "unit_skills")]
+        assert queries[1][2][0]["unit_assessment_id"] == assessment.id
+        assert skill.unit_assessment_id == assessment.id
+
+    def test_nested_unit_of_work(self):
+        """
+        test records of a failed nested unit of work are not flushed
+        """
+
+        with UnitAssessment.transaction(unit_of_work=True):
+
+            UnitAssessment(name="kept").save()
+
+            with pytest.raises(ValueError):
+                with UnitAssessment.transaction(unit_of_work=True):
+                    UnitAssessment(name="discarded").save()
+                    raise ValueError("rollback")
+
+        queries = UnitAssessment.db.queries
+
+        assert len(queries) == 1
+        assert [row["name"] for row in queries[0][2]] == ["kept"]
+
+
+class TestTransaction:
+
+    def test_savepoint(self, fake_database):
+        """
+        test nested transactions roll back to their savepoint and commit once
+        """
+
+        db = fake_database()
+
+        with db.transaction():
+
+            with db.transaction():
+                pass
+
+            with pytest.raises(ValueError):
+                with db.transaction():
+                    raise ValueError("rollback")
+
+        assert [query for query, _ in db.single_conn.statements] == [
+            "SAVEPOINT kam_savepoint_1;",
+            "RELEASE SAVEPOINT kam_savepoint_1;",
+            "SAVEPOINT kam_savepoint_1;",
+            "ROLLBACK TO SAVEPOINT kam_savepoint_1;",
+            "COMMIT"]
+        assert db.transaction_depth == 0